@@ -0,0 +1,262 @@
+"""
+Google Drive metadata mirror module.
+Keeps a local SQLite copy of file metadata current with the Drive Changes API,
+so repeated searches can be answered without a Drive round trip.
+"""
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Generator, List, Optional
+
+from google.oauth2 import service_account
+from googleapiclient.errors import HttpError
+
+from drive_utils import FILE_TYPE_MIME_TYPES, GoogleDriveUtils, LRUCache, credentials_fingerprint
+
+FILE_FIELDS = 'id, name, mimeType, parents, modifiedTime, trashed'
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+    id TEXT PRIMARY KEY,
+    name TEXT NOT NULL,
+    mime_type TEXT,
+    parent_id TEXT,
+    modified_time TEXT
+);
+CREATE TABLE IF NOT EXISTS file_parents (
+    file_id TEXT NOT NULL,
+    parent_id TEXT NOT NULL,
+    PRIMARY KEY (file_id, parent_id)
+);
+CREATE INDEX IF NOT EXISTS file_parents_parent_id ON file_parents (parent_id);
+CREATE TABLE IF NOT EXISTS sync_state (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+"""
+
+
+class DriveMetadataMirror:
+    """Local SQLite mirror of the Drive file metadata visible to one service account."""
+
+    # Directory holding one mirror database per service account
+    MIRROR_DIR = os.path.join(tempfile.gettempdir(), "dify_google_drive")
+
+    # Mirrors open connections per operation only, so an evicted mirror holds no resources
+    _instances = LRUCache(GoogleDriveUtils.CACHE_MAX_ENTRIES)
+
+    def __init__(self, credentials: service_account.Credentials, db_path: str):
+        self.credentials = credentials
+        self.db_path = db_path
+        self._sync_lock = threading.Lock()
+        with self._connect() as conn:
+            conn.executescript(SCHEMA)
+
+    @classmethod
+    def for_credentials(cls, credentials: service_account.Credentials) -> "DriveMetadataMirror":
+        """
+        Get the process-wide mirror of the given service account
+        """
+        fingerprint = credentials_fingerprint(credentials)
+
+        def factory() -> "DriveMetadataMirror":
+            os.makedirs(cls.MIRROR_DIR, exist_ok=True)
+            db_path = os.path.join(cls.MIRROR_DIR, f"mirror-{fingerprint[:16]}.sqlite3")
+            return cls(credentials, db_path)
+
+        return cls._instances.get_or_create(fingerprint, factory)
+
+    @contextmanager
+    def _connect(self) -> Generator[sqlite3.Connection, None, None]:
+        # One short-lived connection per operation keeps the mirror safe to use from any thread
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        try:
+            conn.execute("PRAGMA journal_mode=WAL")
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def _get_state(self, conn: sqlite3.Connection, key: str) -> Optional[str]:
+        row = conn.execute("SELECT value FROM sync_state WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def _set_state(self, conn: sqlite3.Connection, key: str, value: str) -> None:
+        conn.execute(
+            "INSERT INTO sync_state (key, value) VALUES (?, ?) "
+            "ON CONFLICT(key) DO UPDATE SET value = excluded.value",
+            (key, value)
+        )
+
+    @staticmethod
+    def _upsert(conn: sqlite3.Connection, file: dict) -> None:
+        parents = file.get('parents', [])
+        conn.execute(
+            "INSERT INTO files (id, name, mime_type, parent_id, modified_time) VALUES (?, ?, ?, ?, ?) "
+            "ON CONFLICT(id) DO UPDATE SET name = excluded.name, mime_type = excluded.mime_type, "
+            "parent_id = excluded.parent_id, modified_time = excluded.modified_time",
+            (file['id'], file.get('name', ''), file.get('mimeType'),
+             parents[0] if parents else 'root', file.get('modifiedTime'))
+        )
+        conn.execute("DELETE FROM file_parents WHERE file_id = ?", (file['id'],))
+        conn.executemany(
+            "INSERT INTO file_parents (file_id, parent_id) VALUES (?, ?)",
+            [(file['id'], parent) for parent in parents]
+        )
+
+    @staticmethod
+    def _delete(conn: sqlite3.Connection, file_id: str) -> None:
+        conn.execute("DELETE FROM files WHERE id = ?", (file_id,))
+        conn.execute("DELETE FROM file_parents WHERE file_id = ?", (file_id,))
+
+    def staleness(self) -> Optional[float]:
+        """
+        Seconds since the mirror was last synchronized, or None if it was never bootstrapped
+        """
+        with self._connect() as conn:
+            synced_at = self._get_state(conn, 'synced_at')
+        return time.time() - float(synced_at) if synced_at else None
+
+    def root_folder_id(self) -> str:
+        """
+        Real ID of the My Drive root folder, which Drive reports in parents instead of "root".
+        It is looked up once and kept with the mirror.
+        """
+        with self._connect() as conn:
+            root_id = self._get_state(conn, 'root_id')
+        if root_id is None:
+            service = GoogleDriveUtils.get_drive_service(self.credentials)
+            root_id = GoogleDriveUtils.execute(service.files().get(fileId='root', fields='id'))['id']
+            with self._connect() as conn:
+                self._set_state(conn, 'root_id', root_id)
+        return root_id
+
+    def sync(self, max_staleness: float = 0) -> float:
+        """
+        Bring the mirror up to date unless it was synchronized within max_staleness seconds.
+        The first call bootstraps the mirror from a full listing, later calls apply the
+        Changes API feed from the stored page token. When Drive rejects the stored token
+        as expired or invalid, the mirror is bootstrapped again.
+
+        Args:
+            max_staleness: Accepted age of the mirror in seconds
+
+        Returns:
+            Age of the mirror in seconds after the call
+        """
+        with self._sync_lock:
+            staleness = self.staleness()
+            if staleness is not None and staleness <= max_staleness:
+                return staleness
+
+            service = GoogleDriveUtils.get_drive_service(self.credentials)
+            with self._connect() as conn:
+                page_token = self._get_state(conn, 'page_token')
+            if page_token is None:
+                self._bootstrap(service)
+                return 0.0
+            try:
+                self._apply_changes(service, page_token)
+            except HttpError as error:
+                # An expired or invalid page token is rejected for good, start over from a full listing
+                if error.resp.status not in (400, 410):
+                    raise
+                print(f"Drive rejected the mirror's change token, bootstrapping again: {error}")
+                self._bootstrap(service)
+            return 0.0
+
+    def _bootstrap(self, service) -> None:
+        # Take the change token first so nothing modified during the listing is missed
+        start_page_token = GoogleDriveUtils.execute(service.changes().getStartPageToken())['startPageToken']
+        print("Bootstrapping Drive metadata mirror from a full listing")
+
+        count = 0
+        page_token = None
+        with self._connect() as conn:
+            conn.execute("DELETE FROM files")
+            conn.execute("DELETE FROM file_parents")
+            while True:
+                response = GoogleDriveUtils.execute(service.files().list(
+                    q='trashed = false',
+                    spaces='drive',
+                    fields=f'nextPageToken, files({FILE_FIELDS})',
+                    pageSize=GoogleDriveUtils.SEARCH_PAGE_SIZE,
+                    pageToken=page_token
+                ))
+                for file in response.get('files', []):
+                    self._upsert(conn, file)
+                    count += 1
+                page_token = response.get('nextPageToken')
+                if not page_token:
+                    break
+            self._set_state(conn, 'page_token', start_page_token)
+            self._set_state(conn, 'synced_at', str(time.time()))
+        print(f"Drive metadata mirror bootstrapped with {count} files")
+
+    def _apply_changes(self, service, page_token: str) -> None:
+        count = 0
+        with self._connect() as conn:
+            while True:
+                response = GoogleDriveUtils.execute(service.changes().list(
+                    pageToken=page_token,
+                    spaces='drive',
+                    includeRemoved=True,
+                    fields=f'nextPageToken, newStartPageToken, changes(fileId, removed, file({FILE_FIELDS}))',
+                    pageSize=GoogleDriveUtils.SEARCH_PAGE_SIZE
+                ))
+                for change in response.get('changes', []):
+                    file = change.get('file')
+                    if change.get('removed') or not file or file.get('trashed'):
+                        self._delete(conn, change['fileId'])
+                    else:
+                        self._upsert(conn, file)
+                    count += 1
+                if 'newStartPageToken' in response:
+                    page_token = response['newStartPageToken']
+                    break
+                page_token = response['nextPageToken']
+            self._set_state(conn, 'page_token', page_token)
+            self._set_state(conn, 'synced_at', str(time.time()))
+        print(f"Applied {count} Drive changes to the metadata mirror")
+
+    def search(self, query: str, max_results: int, parent_id: Optional[str] = None,
+               file_type: Optional[str] = None) -> List[Dict]:
+        """
+        Search mirrored files by name, with the same filters and result shape as
+        GoogleDriveUtils.iter_search_files
+
+        Args:
+            query: Text contained in the file name
+            max_results: Maximum number of results to return
+            parent_id: Optional parent folder ID to search within, "root" for My Drive
+            file_type: Optional file type filter
+
+        Returns:
+            List of dictionaries with file details
+        """
+        if parent_id == 'root':
+            parent_id = self.root_folder_id()
+        escaped = query.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+        sql = "SELECT f.id, f.name, f.mime_type, f.parent_id FROM files f"
+        params: list = []
+        if parent_id:
+            sql += " JOIN file_parents p ON p.file_id = f.id AND p.parent_id = ?"
+            params.append(parent_id)
+        sql += " WHERE f.name LIKE ? ESCAPE '\\'"
+        params.append(f"%{escaped}%")
+        mime_type = FILE_TYPE_MIME_TYPES.get((file_type or "").lower())
+        if mime_type:
+            sql += " AND f.mime_type = ?"
+            params.append(mime_type)
+        sql += " ORDER BY f.modified_time DESC LIMIT ?"
+        params.append(max_results)
+
+        with self._connect() as conn:
+            rows = conn.execute(sql, params).fetchall()
+        return [
+            {'id': row[0], 'name': row[1], 'mime_type': row[2], 'parent_id': row[3]}
+            for row in rows
+        ]
@@ -0,0 +1,972 @@
+"""
+Google Drive text utilities module.
+Contains text extraction and snippet helpers used by the content tools.
+"""
+import base64
+import codecs
+import csv
+import io
+import posixpath
+import re
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+from typing import BinaryIO, Dict, Generator, Iterable, List, Optional
+from xml.etree import ElementTree
+
+from google.oauth2 import service_account
+from googleapiclient.errors import HttpError
+
+from drive_utils import DOWNLOAD_FIELDS, EXPORT_FORMATS, GoogleDriveUtils, LRUCache, escape_query_value
+
+# Google Workspace types and the plain text format they are exported to for text extraction
+TEXT_EXPORT_MIME_TYPES = {
+    "application/vnd.google-apps.document": "text/plain",
+    "application/vnd.google-apps.presentation": "text/plain",
+    "application/vnd.google-apps.spreadsheet": "text/csv",
+}
+
+# Non-Workspace types that are read as text directly
+TEXT_MIME_TYPES = {
+    "application/json",
+    "application/xml",
+    "application/javascript",
+    "application/x-yaml",
+}
+
+# Maximum number of characters kept per cached text extract
+EXTRACT_MAX_CHARS = 64 * 1024
+
+# Text extracts keyed by (file ID, modifiedTime), bounded by their total number of characters
+_extract_cache = LRUCache(max_size=2048, max_weight=32 * 1024 * 1024, weigher=len)
+
+
+def is_text_mime_type(mime_type: str) -> bool:
+    return mime_type.startswith("text/") or mime_type in TEXT_MIME_TYPES
+
+
+def get_text_extract(file: Dict, credentials: service_account.Credentials) -> Optional[str]:
+    """
+    Get a size-capped text extract of a Drive file, cached by file ID and modifiedTime
+
+    Args:
+        file: Drive file resource with id, mimeType and modifiedTime
+        credentials: Google service account credentials
+
+    Returns:
+        Up to EXTRACT_MAX_CHARS characters of text, or None if the type has no text form
+    """
+    mime_type = file.get("mimeType", "")
+    if mime_type not in TEXT_EXPORT_MIME_TYPES and not is_text_mime_type(mime_type):
+        return None
+
+    cache_key = (file["id"], file.get("modifiedTime"))
+    cached = _extract_cache.get(cache_key)
+    if cached is not None:
+        return cached
+
+    service = GoogleDriveUtils.get_drive_service(credentials)
+    if mime_type in TEXT_EXPORT_MIME_TYPES:
+        content = GoogleDriveUtils.execute(service.files().export_media(
+            fileId=file["id"], mimeType=TEXT_EXPORT_MIME_TYPES[mime_type]
+        ))
+    else:
+        # Only the leading bytes are needed for the extract
+        request = service.files().get_media(fileId=file["id"])
+        request.headers["Range"] = f"bytes=0-{EXTRACT_MAX_CHARS * 4 - 1}"
+        content = GoogleDriveUtils.execute(request)
+
+    text = content[:EXTRACT_MAX_CHARS * 4].decode("utf-8", errors="ignore")[:EXTRACT_MAX_CHARS]
+    _extract_cache.put(cache_key, text)
+    return text
+
+
+def make_snippet(text: str, query: str, radius: int = 120) -> str:
+    """
+    Cut a short snippet of text around the first match of the query or one of its words
+    """
+    lowered = text.lower()
+    position = lowered.find(query.lower())
+    if position < 0:
+        for word in sorted(query.split(), key=len, reverse=True):
+            position = lowered.find(word.lower())
+            if position >= 0:
+                break
+
+    if position < 0:
+        start, end = 0, radius * 2
+    else:
+        start, end = max(0, position - radius), position + len(query) + radius
+
+    snippet = re.sub(r"\s+", " ", text[start:end]).strip()
+    if start > 0:
+        snippet = "..." + snippet
+    if end < len(text):
+        snippet += "..."
+    return snippet
+
+
+def search_file_contents(query: str, max_results: int, credentials: service_account.Credentials,
+                         parent_id: Optional[str] = None, max_workers: int = 4) -> List[Dict]:
+    """
+    Search files by content with a fullText query and attach a text snippet to each hit
+
+    Args:
+        query: Text to search for in file contents
+        max_results: Maximum number of results to return
+        credentials: Google service account credentials
+        parent_id: Optional parent folder ID to search within
+        max_workers: Number of snippet extracts fetched concurrently
+
+    Returns:
+        List of dictionaries with file details and a snippet (None if the type has no text form)
+    """
+    search_query = f"fullText contains '{escape_query_value(query)}' and trashed=false"
+    if parent_id:
+        search_query += f" and '{parent_id}' in parents"
+    print(f"Content search query: {search_query}")
+
+    files = []
+    for page in GoogleDriveUtils.iter_query_pages(
+        search_query, max_results, credentials, fields='id, name, mimeType, parents, modifiedTime'
+    ):
+        files.extend(page)
+
+    def snippet_for(file: Dict) -> Optional[str]:
+        try:
+            text = get_text_extract(file, credentials)
+        except HttpError as error:
+            print(f"Could not extract text of file {file['id']}: {error}")
+            return None
+        return make_snippet(text, query) if text else None
+
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        snippets = list(pool.map(snippet_for, files))
+
+    return [
+        {
+            'id': file.get('id'),
+            'name': file.get('name'),
+            'mime_type': file.get('mimeType'),
+            'parent_id': file.get('parents', ['root'])[0] if 'parents' in file else 'root',
+            'modified_time': file.get('modifiedTime'),
+            'snippet': snippet
+        } for file, snippet in zip(files, snippets)
+    ]
+
+
+# Export formats used to read Google Workspace files, chosen to keep headings, sheets and slides
+READ_EXPORT_FORMATS = {
+    "application/vnd.google-apps.document": "markdown",
+    "application/vnd.google-apps.spreadsheet": "xlsx",
+    "application/vnd.google-apps.presentation": "pptx",
+}
+
+# Default character budget of a text read
+READ_MAX_CHARS = 20000
+# Size of the byte ranges text files are read in, so reading stops soon after the budget is spent
+READ_RANGE_SIZE = 256 * 1024
+# Longest paragraph yielded as one block, longer runs of text are split
+MAX_BLOCK_CHARS = 4000
+
+DOCX_MIME_TYPE = EXPORT_FORMATS["docx"][0]
+XLSX_MIME_TYPE = EXPORT_FORMATS["xlsx"][0]
+PPTX_MIME_TYPE = EXPORT_FORMATS["pptx"][0]
+
+WORD_NS = "{http://schemas.openxmlformats.org/wordprocessingml/2006/main}"
+SHEET_NS = "{http://schemas.openxmlformats.org/spreadsheetml/2006/main}"
+DRAWING_NS = "{http://schemas.openxmlformats.org/drawingml/2006/main}"
+PRESENTATION_NS = "{http://schemas.openxmlformats.org/presentationml/2006/main}"
+RELATIONSHIP_NS = "{http://schemas.openxmlformats.org/officeDocument/2006/relationships}"
+PACKAGE_RELATIONSHIP_NS = "{http://schemas.openxmlformats.org/package/2006/relationships}"
+
+_CONTROL_CHARS = re.compile(r"[\x00-\x08\x0b-\x1f\x7f]")
+_MARKDOWN_HEADING = re.compile(r"^(#{1,6})\s+(.*?)\s*#*\s*$")
+_CELL_COLUMN = re.compile(r"[A-Z]+")
+
+
+def clean_text(text: str) -> str:
+    """
+    Remove control characters and collapse runs of spaces within the text
+    """
+    text = _CONTROL_CHARS.sub("", text)
+    return re.sub(r"[ \t\u00a0]+", " ", text).strip()
+
+
+def make_block(kind: str, text: str, page: Optional[int] = None, byte_offset: Optional[int] = None,
+               level: int = 0) -> Dict:
+    """
+    Build a text block as yielded by the extractors
+
+    Args:
+        kind: "heading", "paragraph" or "row"
+        text: Cleaned text of the block
+        page: 1-based page, slide or sheet number, if the format has pages
+        byte_offset: Offset of the block in the source bytes, if known
+        level: Heading level, 1 for top-level headings
+    """
+    return {"kind": kind, "text": text, "page": page, "byte_offset": byte_offset, "level": level}
+
+
+def iter_file_chunks(fileobj: BinaryIO, chunk_size: int = READ_RANGE_SIZE) -> Generator[bytes, None, None]:
+    while True:
+        chunk = fileobj.read(chunk_size)
+        if not chunk:
+            return
+        yield chunk
+
+
+def iter_byte_ranges(file_id: str, credentials: service_account.Credentials, start: int, size: int,
+                     range_size: int = READ_RANGE_SIZE) -> Generator[bytes, None, None]:
+    """
+    Download the content of a binary file from start to size in consecutive byte ranges.
+    Each range is only requested when the consumer asks for it.
+    """
+    service = GoogleDriveUtils.get_drive_service(credentials)
+    offset = start
+    while offset < size:
+        end = min(offset + range_size, size) - 1
+        request = service.files().get_media(fileId=file_id)
+        request.headers["Range"] = f"bytes={offset}-{end}"
+        data = GoogleDriveUtils.execute(request)
+        if not data:
+            return
+        yield data
+        offset += len(data)
+
+
+def _utf8_cut(data: bytearray, limit: int) -> int:
+    """
+    Largest cut position up to limit that does not split a UTF-8 character
+    """
+    cut = limit
+    while cut > 0 and data[cut] & 0xC0 == 0x80:
+        cut -= 1
+    return cut or limit
+
+
+def iter_lines(chunks: Iterable[bytes], start_offset: int = 0,
+               max_line_bytes: int = MAX_BLOCK_CHARS) -> Generator[tuple[int, str, bool], None, None]:
+    """
+    Split a stream of byte chunks into decoded lines with the byte offset each line starts at
+    and whether the line ends there. Lines longer than max_line_bytes are yielded in pieces,
+    so a stream without newlines is never held in memory as a whole.
+    Splitting on raw newlines is safe for UTF-8, where a newline byte never occurs inside
+    a multi-byte character.
+    """
+    offset = start_offset
+    pending = bytearray()
+    for chunk in chunks:
+        start = 0
+        while start < len(chunk):
+            newline = chunk.find(b"\n", start)
+            end = newline if newline >= 0 else len(chunk)
+            pending += memoryview(chunk)[start:end]
+            while len(pending) > max_line_bytes:
+                cut = _utf8_cut(pending, max_line_bytes)
+                yield offset, pending[:cut].decode("utf-8", errors="replace"), False
+                offset += cut
+                del pending[:cut]
+            if newline < 0:
+                break
+            yield offset, pending.rstrip(b"\r").decode("utf-8", errors="replace"), True
+            offset += len(pending) + 1
+            pending.clear()
+            start = newline + 1
+    if pending:
+        yield offset, pending.rstrip(b"\r").decode("utf-8", errors="replace"), True
+
+
+def extract_plain_text(chunks: Iterable[bytes], start_offset: int = 0,
+                       markdown: bool = False) -> Generator[Dict, None, None]:
+    """
+    Yield the paragraphs of a text stream, separated by blank lines.
+    With markdown, "#" heading lines are yielded as heading blocks.
+    """
+    lines: List[str] = []
+    paragraph_offset = start_offset
+    length = 0
+    continued = False
+    for offset, line, complete in iter_lines(chunks, start_offset):
+        heading = _MARKDOWN_HEADING.match(line) if markdown and complete and not continued else None
+        # Pieces of an overlong line are blocks of their own
+        if heading or not line.strip() or length >= MAX_BLOCK_CHARS or continued or not complete:
+            if lines:
+                yield make_block("paragraph", clean_text("\n".join(lines)), byte_offset=paragraph_offset)
+                lines, length = [], 0
+        if heading:
+            yield make_block("heading", clean_text(heading.group(2)), byte_offset=offset,
+                             level=len(heading.group(1)))
+        elif line.strip():
+            if not lines:
+                paragraph_offset = offset
+            lines.append(line)
+            length += len(line)
+        continued = not complete
+    if lines:
+        yield make_block("paragraph", clean_text("\n".join(lines)), byte_offset=paragraph_offset)
+
+
+def extract_csv_rows(chunks: Iterable[bytes], start_offset: int = 0) -> Generator[Dict, None, None]:
+    """
+    Yield every non-empty line of a CSV stream as a row block, overlong lines are split
+    """
+    for offset, line, _ in iter_lines(chunks, start_offset):
+        if line.strip():
+            yield make_block("row", _CONTROL_CHARS.sub("", line), byte_offset=offset)
+
+
+def extract_pdf_text(fileobj: BinaryIO) -> Generator[Dict, None, None]:
+    """
+    Yield the text of every page of a PDF, one block per page.
+    Pages are only parsed when the consumer asks for them.
+    """
+    try:
+        from pypdf import PdfReader
+    except ImportError:
+        raise ValueError("Reading PDF files requires the pypdf package")
+
+    reader = PdfReader(fileobj)
+    for number, page in enumerate(reader.pages, start=1):
+        text = clean_text(page.extract_text() or "")
+        if text:
+            yield make_block("paragraph", text, page=number)
+
+
+def _docx_paragraph_text(paragraph: ElementTree.Element) -> str:
+    parts = []
+    for element in paragraph.iter():
+        if element.tag == f"{WORD_NS}t" and element.text:
+            parts.append(element.text)
+        elif element.tag == f"{WORD_NS}tab":
+            parts.append("\t")
+        elif element.tag in (f"{WORD_NS}br", f"{WORD_NS}cr") and element.get(f"{WORD_NS}type") != "page":
+            parts.append("\n")
+    return "".join(parts)
+
+
+def extract_docx_text(fileobj: BinaryIO) -> Generator[Dict, None, None]:
+    """
+    Yield the paragraphs of a Word document in document order. Heading and title styles
+    become heading blocks, and page numbers follow the page breaks recorded in the file.
+    """
+    page = 1
+    with zipfile.ZipFile(fileobj) as package, package.open("word/document.xml") as document:
+        for _, element in ElementTree.iterparse(document, events=("end",)):
+            if element.tag != f"{WORD_NS}p":
+                continue
+            breaks = sum(
+                1 for child in element.iter()
+                if child.tag == f"{WORD_NS}lastRenderedPageBreak"
+                or (child.tag == f"{WORD_NS}br" and child.get(f"{WORD_NS}type") == "page")
+            )
+            style = element.find(f"{WORD_NS}pPr/{WORD_NS}pStyle")
+            style_name = style.get(f"{WORD_NS}val", "") if style is not None else ""
+            text = clean_text(_docx_paragraph_text(element))
+            page += breaks
+            element.clear()
+            if not text:
+                continue
+            level = re.fullmatch(r"(?i)heading\s*([1-9])", style_name)
+            if level:
+                yield make_block("heading", text, page=page, level=int(level.group(1)))
+            elif style_name.lower() == "title":
+                yield make_block("heading", text, page=page, level=1)
+            else:
+                yield make_block("paragraph", text, page=page)
+
+
+def _package_relationships(package: zipfile.ZipFile, part: str) -> Dict[str, str]:
+    """
+    Map the relationship IDs of a package part to the paths of their target parts
+    """
+    folder, name = posixpath.split(part)
+    rels_path = posixpath.join(folder, "_rels", f"{name}.rels")
+    if rels_path not in package.namelist():
+        return {}
+    root = ElementTree.fromstring(package.read(rels_path))
+    targets = {}
+    for rel in root.iter(f"{PACKAGE_RELATIONSHIP_NS}Relationship"):
+        target = rel.get("Target", "")
+        # Targets are relative to the part's folder unless they start at the package root
+        path = target.lstrip("/") if target.startswith("/") else posixpath.join(folder, target)
+        targets[rel.get("Id")] = posixpath.normpath(path)
+    return targets
+
+
+def _column_index(cell_reference: str) -> int:
+    letters = _CELL_COLUMN.match(cell_reference or "")
+    index = 0
+    for letter in letters.group(0) if letters else "":
+        index = index * 26 + ord(letter) - ord("A") + 1
+    return index - 1
+
+
+def _csv_line(values: List[str]) -> str:
+    buffer = io.StringIO()
+    csv.writer(buffer, lineterminator="").writerow(values)
+    return buffer.getvalue()
+
+
+def extract_xlsx_rows(fileobj: BinaryIO) -> Generator[Dict, None, None]:
+    """
+    Yield a heading block per worksheet followed by its non-empty rows as CSV lines.
+    The page of each block is the 1-based worksheet number.
+    """
+    with zipfile.ZipFile(fileobj) as package:
+        shared_strings: List[str] = []
+        if "xl/sharedStrings.xml" in package.namelist():
+            with package.open("xl/sharedStrings.xml") as strings:
+                for _, element in ElementTree.iterparse(strings, events=("end",)):
+                    if element.tag == f"{SHEET_NS}si":
+                        shared_strings.append("".join(
+                            text.text or "" for text in element.iter(f"{SHEET_NS}t")
+                        ))
+                        element.clear()
+
+        workbook = ElementTree.fromstring(package.read("xl/workbook.xml"))
+        targets = _package_relationships(package, "xl/workbook.xml")
+        sheets = workbook.iter(f"{SHEET_NS}sheet")
+        for number, sheet in enumerate(sheets, start=1):
+            path = targets.get(sheet.get(f"{RELATIONSHIP_NS}id"))
+            if not path or path not in package.namelist():
+                continue
+            yield make_block("heading", clean_text(sheet.get("name", f"Sheet{number}")), page=number, level=1)
+            with package.open(path) as worksheet:
+                for _, element in ElementTree.iterparse(worksheet, events=("end",)):
+                    if element.tag != f"{SHEET_NS}row":
+                        continue
+                    values: List[str] = []
+                    for cell in element.iter(f"{SHEET_NS}c"):
+                        cell_type = cell.get("t")
+                        if cell_type == "inlineStr":
+                            value = "".join(text.text or "" for text in cell.iter(f"{SHEET_NS}t"))
+                        else:
+                            raw = cell.findtext(f"{SHEET_NS}v") or ""
+                            value = shared_strings[int(raw)] if cell_type == "s" and raw.isdigit() else raw
+                        column = _column_index(cell.get("r")) if cell.get("r") else len(values)
+                        values.extend([""] * (column - len(values)))
+                        values.append(_CONTROL_CHARS.sub("", value))
+                    element.clear()
+                    if any(value.strip() for value in values):
+                        yield make_block("row", _csv_line(values), page=number)
+
+
+def extract_pptx_text(fileobj: BinaryIO) -> Generator[Dict, None, None]:
+    """
+    Yield a heading block per slide in presentation order followed by its paragraphs.
+    The page of each block is the 1-based slide number.
+    """
+    with zipfile.ZipFile(fileobj) as package:
+        presentation = ElementTree.fromstring(package.read("ppt/presentation.xml"))
+        targets = _package_relationships(package, "ppt/presentation.xml")
+        slides = [
+            targets.get(slide.get(f"{RELATIONSHIP_NS}id"))
+            for slide in presentation.iter(f"{PRESENTATION_NS}sldId")
+        ]
+        for number, path in enumerate(slides, start=1):
+            if not path or path not in package.namelist():
+                continue
+            slide = ElementTree.fromstring(package.read(path))
+            paragraphs = [
+                clean_text("".join(text.text or "" for text in paragraph.iter(f"{DRAWING_NS}t")))
+                for paragraph in slide.iter(f"{DRAWING_NS}p")
+            ]
+            paragraphs = [paragraph for paragraph in paragraphs if paragraph]
+            title = paragraphs.pop(0) if paragraphs else ""
+            yield make_block("heading", f"Slide {number}: {title}" if title else f"Slide {number}",
+                             page=number, level=1)
+            for paragraph in paragraphs:
+                yield make_block("paragraph", paragraph, page=number)
+
+
+# Extractors of downloaded binary formats
+EXTRACTORS = {
+    "application/pdf": extract_pdf_text,
+    DOCX_MIME_TYPE: extract_docx_text,
+    XLSX_MIME_TYPE: extract_xlsx_rows,
+    PPTX_MIME_TYPE: extract_pptx_text,
+}
+
+# Drive types without a text form
+NO_TEXT_MIME_TYPES = {
+    "application/vnd.google-apps.folder",
+    "application/vnd.google-apps.drawing",
+    "application/vnd.google-apps.form",
+    "application/vnd.google-apps.script",
+}
+
+
+def iter_text_blocks(file_info: Dict, credentials: service_account.Credentials, byte_offset: int = 0,
+                     fileobjs: Optional[List[BinaryIO]] = None) -> Generator[Dict, None, None]:
+    """
+    Stream the text of a Drive file as blocks with page and byte offsets.
+    Text files are read in byte ranges from byte_offset on, so nothing beyond what the
+    consumer reads is downloaded. Office files and PDFs are downloaded (or served from the
+    download cache) first, Google Workspace files are exported in READ_EXPORT_FORMATS.
+
+    Args:
+        file_info: Drive metadata with the DOWNLOAD_FIELDS of the file
+        credentials: Google service account credentials
+        byte_offset: Offset text files are read from
+        fileobjs: List the downloaded file is appended to, so the caller can close it
+
+    Raises:
+        ValueError: If the file type has no text form
+    """
+    mime_type = file_info.get("mimeType", "")
+    if mime_type in NO_TEXT_MIME_TYPES:
+        raise ValueError(f"Cannot read text from files of type {mime_type}")
+
+    if mime_type not in READ_EXPORT_FORMATS and is_text_mime_type(mime_type):
+        chunks = iter_byte_ranges(file_info["id"], credentials, byte_offset, int(file_info.get("size", 0)))
+        if mime_type == "text/csv":
+            yield from extract_csv_rows(chunks, byte_offset)
+        else:
+            yield from extract_plain_text(chunks, byte_offset, markdown=mime_type == "text/markdown")
+        return
+
+    if mime_type not in READ_EXPORT_FORMATS and mime_type not in EXTRACTORS:
+        raise ValueError(f"Cannot read text from files of type {mime_type}")
+
+    fileobj, metadata = GoogleDriveUtils.download_file_spooled(
+        file_info["id"], credentials, file_info=file_info,
+        export_format=READ_EXPORT_FORMATS.get(mime_type, "pdf")
+    )
+    if fileobj is None:
+        raise ValueError(f"Failed to download file with ID: {file_info['id']}")
+    if fileobjs is not None:
+        fileobjs.append(fileobj)
+
+    content_type = metadata["mime_type"]
+    if content_type == "text/markdown":
+        yield from extract_plain_text(iter_file_chunks(fileobj), markdown=True)
+    else:
+        yield from EXTRACTORS[content_type](fileobj)
+
+
+def render_block(block: Dict) -> str:
+    """
+    Render a block as text, headings as Markdown headings
+    """
+    if block["kind"] == "heading":
+        return f"{'#' * max(block['level'], 1)} {block['text']}"
+    return block["text"]
+
+
+def block_separator(previous: Optional[Dict], block: Dict) -> str:
+    """
+    Separator between two rendered blocks: rows are joined by a newline, everything else
+    by a blank line
+    """
+    if previous is None:
+        return ""
+    return "\n" if previous["kind"] == "row" and block["kind"] == "row" else "\n\n"
+
+
+def limit_blocks(blocks: Iterable[Dict], max_chars: int, start_page: int = 1,
+                 max_pages: Optional[int] = None, max_rows: Optional[int] = None,
+                 state: Optional[Dict] = None) -> Generator[Dict, None, None]:
+    """
+    Pass on the blocks within the page, row and character limits, stopping the source
+    as soon as a limit is reached. Characters are counted on the rendered blocks and
+    their separators, and the last block is cut to fit the budget.
+
+    Args:
+        blocks: Blocks as yielded by the extractors
+        max_chars: Maximum number of rendered characters
+        start_page: First page, slide or sheet to pass on
+        max_pages: Maximum number of pages, slides or sheets to pass on
+        max_rows: Maximum number of rows to pass on
+        state: Dictionary that receives "stopped_at", the block a limit stopped at
+    """
+    state = state if state is not None else {}
+    state["stopped_at"] = None
+    length = 0
+    rows = 0
+    previous = None
+    for block in blocks:
+        page = block["page"]
+        if page is not None and page < start_page:
+            continue
+        if (page is not None and max_pages and page >= start_page + max_pages) \
+                or (block["kind"] == "row" and max_rows is not None and rows >= max_rows):
+            state["stopped_at"] = block
+            return
+
+        separator = block_separator(previous, block)
+        size = len(separator) + len(render_block(block))
+        if length + size > max_chars:
+            state["stopped_at"] = block
+            keep = len(block["text"]) - (length + size - max_chars)
+            if keep > 0:
+                yield {**block, "text": block["text"][:keep]}
+            return
+
+        yield block
+        length += size
+        rows += block["kind"] == "row"
+        previous = block
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    Estimate the number of LLM tokens of a text without a tokenizer: about four
+    characters per token for ASCII text, and one token per other character, which
+    keeps estimates for CJK and other scripts on the safe side
+    """
+    non_ascii = sum(1 for char in text if ord(char) > 127)
+    return (len(text) - non_ascii + 3) // 4 + non_ascii
+
+
+def _token_prefix_length(text: str, max_tokens: int) -> int:
+    """
+    Length of the longest prefix of text within max_tokens estimated tokens, at least 1
+    """
+    ascii_chars = other_chars = 0
+    for position, char in enumerate(text):
+        if ord(char) > 127:
+            other_chars += 1
+        else:
+            ascii_chars += 1
+        if (ascii_chars + 3) // 4 + other_chars > max_tokens:
+            return max(position, 1)
+    return len(text)
+
+
+def _token_spans(text: str, max_tokens: int) -> List[tuple[int, int]]:
+    """
+    Split a text that is over the token budget at sentence, then word boundaries.
+    Returns the (start, end) positions of the pieces in text, so the whitespace
+    between pieces stays as it was.
+    """
+    spans: List[tuple[int, int]] = []
+    current: Optional[List[int]] = None
+
+    def add(start: int, end: int) -> None:
+        nonlocal current
+        if current is not None and estimate_tokens(text[current[0]:end]) <= max_tokens:
+            current[1] = end
+            return
+        if current is not None:
+            spans.append((current[0], current[1]))
+        # Hard-cut words that are over the budget on their own
+        while estimate_tokens(text[start:end]) > max_tokens:
+            cut = start + _token_prefix_length(text[start:end], max_tokens)
+            spans.append((start, cut))
+            start = cut
+        current = [start, end]
+
+    sentence_start = 0
+    for boundary in [*re.finditer(r"(?<=[.!?。！？])\s+|\n+", text), None]:
+        sentence_end = boundary.start() if boundary else len(text)
+        if sentence_end > sentence_start:
+            if estimate_tokens(text[sentence_start:sentence_end]) <= max_tokens:
+                add(sentence_start, sentence_end)
+            else:
+                for word in re.finditer(r"\S+", text[sentence_start:sentence_end]):
+                    add(sentence_start + word.start(), sentence_start + word.end())
+        if boundary:
+            sentence_start = boundary.end()
+    if current is not None:
+        spans.append((current[0], current[1]))
+    return spans
+
+
+def iter_text_chunks(blocks: Iterable[Dict], max_tokens: int) -> Generator[Dict, None, None]:
+    """
+    Group blocks into chunks of at most max_tokens estimated tokens in one streaming pass.
+    Chunks break at headings, carry the path of headings they are under, and record the
+    pages and the byte offset of the text they cover. Blocks over the budget are split
+    at sentence or word boundaries.
+
+    Args:
+        blocks: Blocks as yielded by the extractors or limit_blocks
+        max_tokens: Token budget of each chunk
+
+    Yields:
+        Dictionaries with index, text, token_estimate, heading_path, char_offset (in the
+        rendered text of the whole read), page_start, page_end and byte_offset
+    """
+    headings: List[tuple[int, str]] = []
+    parts: List[str] = []
+    tokens = 0
+    index = 0
+    char_offset = 0
+    chunk_start = 0
+    first: Optional[Dict] = None
+    last: Optional[Dict] = None
+    previous: Optional[Dict] = None
+
+    def make_chunk() -> Dict:
+        return {
+            "index": index,
+            "text": "".join(parts),
+            "token_estimate": tokens,
+            "heading_path": [text for _, text in headings],
+            "char_offset": chunk_start,
+            "page_start": first["page"],
+            "page_end": last["page"],
+            "byte_offset": first["byte_offset"]
+        }
+
+    for block in blocks:
+        separator = block_separator(previous, block)
+        char_offset += len(separator)
+        previous = block
+
+        if block["kind"] == "heading":
+            if parts:
+                yield make_chunk()
+                index += 1
+                parts, tokens = [], 0
+            while headings and headings[-1][0] >= block["level"]:
+                headings.pop()
+            headings.append((block["level"], block["text"]))
+            char_offset += len(render_block(block))
+            continue
+
+        text = block["text"]
+        spans = [(0, len(text))] if estimate_tokens(text) <= max_tokens else _token_spans(text, max_tokens)
+        previous_end = None
+        for start, end in spans:
+            piece = text[start:end]
+            # Pieces of one block are joined by the text between them in the block
+            joiner = (separator if previous_end is None else text[previous_end:start]) if parts else ""
+            piece_tokens = estimate_tokens(piece)
+            if parts and tokens + estimate_tokens(joiner) + piece_tokens > max_tokens:
+                yield make_chunk()
+                index += 1
+                parts, tokens = [], 0
+                joiner = ""
+            if not parts:
+                first = block
+                chunk_start = char_offset + start
+            parts.append(joiner + piece)
+            tokens += estimate_tokens(joiner) + piece_tokens
+            last = block
+            previous_end = end
+        char_offset += len(text)
+
+    if parts:
+        yield make_chunk()
+
+
+def read_file_text(file_id: str, credentials: service_account.Credentials,
+                   max_chars: int = READ_MAX_CHARS, start_page: int = 1, max_pages: Optional[int] = None,
+                   max_rows: Optional[int] = None, byte_offset: int = 0,
+                   chunk_tokens: Optional[int] = None) -> Dict:
+    """
+    Read the text of a Drive file up to a character budget
+
+    Args:
+        file_id: ID of the file to read
+        credentials: Google service account credentials
+        max_chars: Maximum number of characters to return
+        start_page: First page, slide or sheet to read
+        max_pages: Maximum number of pages, slides or sheets to read
+        max_rows: Maximum number of spreadsheet or CSV rows to read
+        byte_offset: Offset text files are read from
+        chunk_tokens: Return the text as chunks of at most this many estimated tokens
+
+    Returns:
+        Dictionary with the file details, truncated and the pages read. The text is
+        returned either as text with segments giving the char_offset and length of
+        each block with its page and byte_offset, or as chunks (see iter_text_chunks).
+        A truncated read has next_page or next_byte_offset set to the page or offset
+        of the block it stopped at.
+    """
+    service = GoogleDriveUtils.get_drive_service(credentials)
+    file_info = GoogleDriveUtils.execute(service.files().get(fileId=file_id, fields=DOWNLOAD_FIELDS))
+
+    state: Dict = {}
+    pages = set()
+    fileobjs: List[BinaryIO] = []
+    blocks = iter_text_blocks(file_info, credentials, byte_offset, fileobjs)
+    result = {
+        "file_id": file_id,
+        "file_name": file_info.get("name"),
+        "mime_type": file_info.get("mimeType"),
+    }
+
+    def track_pages(source: Iterable[Dict]) -> Generator[Dict, None, None]:
+        for block in source:
+            pages.add(block["page"])
+            yield block
+
+    try:
+        limited = track_pages(limit_blocks(blocks, max_chars, start_page, max_pages, max_rows, state))
+        if chunk_tokens:
+            chunks = list(iter_text_chunks(limited, chunk_tokens))
+            result["chunk_count"] = len(chunks)
+            result["char_count"] = sum(len(chunk["text"]) for chunk in chunks)
+            result["chunks"] = chunks
+        else:
+            parts: List[str] = []
+            segments: List[Dict] = []
+            length = 0
+            previous = None
+            for block in limited:
+                separator = block_separator(previous, block)
+                text = render_block(block)
+                if block["kind"] == "row" and previous is not None and previous["kind"] == "row" \
+                        and segments[-1]["page"] == block["page"]:
+                    # Consecutive rows share one segment
+                    segments[-1]["length"] += len(separator) + len(text)
+                else:
+                    segments.append({
+                        "kind": block["kind"],
+                        "char_offset": length + len(separator),
+                        "length": len(text),
+                        "page": block["page"],
+                        "byte_offset": block["byte_offset"]
+                    })
+                parts.append(separator + text)
+                length += len(separator) + len(text)
+                previous = block
+            result["text"] = "".join(parts)
+            result["char_count"] = length
+            result["segments"] = segments
+    finally:
+        blocks.close()
+        for fileobj in fileobjs:
+            fileobj.close()
+
+    stopped_at = state["stopped_at"]
+    pages.discard(None)
+    result["truncated"] = stopped_at is not None
+    result["pages"] = sorted(pages)
+    if stopped_at is not None:
+        if stopped_at["page"] is not None:
+            result["next_page"] = stopped_at["page"]
+        if stopped_at["byte_offset"] is not None:
+            result["next_byte_offset"] = stopped_at["byte_offset"]
+    return result
+
+
+# Default and maximum number of bytes returned by a byte range read
+RANGE_READ_DEFAULT_BYTES = 4096
+RANGE_READ_MAX_BYTES = 1024 * 1024
+# Size of the byte ranges requested while reading lines
+RANGE_READ_LINE_CHUNK = 64 * 1024
+
+
+def _take_bytes(chunks: Iterable[bytes], limit: int) -> Generator[bytes, None, None]:
+    """
+    Pass chunks through until limit bytes were produced, cutting the last one
+    """
+    for chunk in chunks:
+        if limit <= 0:
+            return
+        yield chunk[:limit]
+        limit -= len(chunk)
+
+
+def _decode_range(data: bytes, at_end: bool) -> Optional[tuple[int, str, int]]:
+    """
+    Decode a byte range as UTF-8 text, or return None if it looks binary.
+    Continuation bytes of a character cut at the start of the range are skipped, and a
+    character cut at its end is left for the next read unless the range ends the file.
+
+    Returns:
+        Tuple of the number of skipped leading bytes, the text and the number of bytes decoded
+    """
+    if b"\x00" in data:
+        return None
+    skipped = 0
+    while skipped < min(3, len(data)) and data[skipped] & 0xC0 == 0x80:
+        skipped += 1
+    decoder = codecs.getincrementaldecoder("utf-8")()
+    try:
+        text = decoder.decode(data[skipped:], final=at_end)
+    except UnicodeDecodeError:
+        return None
+    decoded = len(data) - skipped - len(decoder.getstate()[0])
+    if decoded <= 0:
+        return None
+    return skipped, text, decoded
+
+
+def read_file_range(file_id: str, credentials: service_account.Credentials, offset: int = 0,
+                    length: Optional[int] = None, max_lines: Optional[int] = None) -> Dict:
+    """
+    Read part of a binary Drive file with HTTP Range requests, without downloading the rest
+
+    Args:
+        file_id: ID of the file to read
+        credentials: Google service account credentials
+        offset: Byte offset to start reading at
+        length: Number of bytes to read (default: RANGE_READ_DEFAULT_BYTES, at most RANGE_READ_MAX_BYTES)
+        max_lines: Read this many lines instead of a fixed number of bytes, a line is cut
+            when RANGE_READ_MAX_BYTES are read before it ends
+
+    Returns:
+        Dictionary with the file details, offset, length (bytes read) and next_byte_offset
+        (None at the end of the file). Byte reads return content with its encoding,
+        utf-8 or base64 for binary data; utf-8 reads are moved to whole characters, with
+        offset and length covering the decoded bytes. Line reads return lines with the byte_offset
+        and text of each line.
+
+    Raises:
+        ValueError: If the file has no binary content, such as a Google Workspace document
+    """
+    service = GoogleDriveUtils.get_drive_service(credentials)
+    file_info = GoogleDriveUtils.execute(service.files().get(fileId=file_id, fields=DOWNLOAD_FIELDS))
+    mime_type = file_info.get("mimeType", "")
+    if mime_type.startswith("application/vnd.google-apps.") or "size" not in file_info:
+        raise ValueError(
+            f"File '{file_info.get('name')}' has no binary content to read by byte range, "
+            f"use google-drive-file-read-text for Google Workspace files"
+        )
+
+    size = int(file_info["size"])
+    offset = min(max(0, offset), size)
+    result = {
+        "file_id": file_id,
+        "file_name": file_info.get("name"),
+        "mime_type": mime_type,
+        "file_size": size,
+        "offset": offset,
+    }
+
+    if max_lines:
+        end = min(offset + RANGE_READ_MAX_BYTES, size)
+        chunks = _take_bytes(
+            iter_byte_ranges(file_id, credentials, offset, size, RANGE_READ_LINE_CHUNK), end - offset
+        )
+        lines = []
+        next_byte_offset = None
+        line_iter = iter_lines(chunks, offset, RANGE_READ_MAX_BYTES)
+        try:
+            for line_offset, text, _ in line_iter:
+                if len(lines) == max_lines:
+                    # The offset of the next line is known once it has started
+                    next_byte_offset = line_offset
+                    break
+                lines.append({"byte_offset": line_offset, "text": text})
+        finally:
+            line_iter.close()
+        if next_byte_offset is None and end < size:
+            # The byte limit was reached before max_lines lines were complete
+            next_byte_offset = end
+        result["length"] = (next_byte_offset if next_byte_offset is not None else size) - offset
+        result["line_count"] = len(lines)
+        result["lines"] = lines
+    else:
+        length = max(1, min(length or RANGE_READ_DEFAULT_BYTES, RANGE_READ_MAX_BYTES))
+        end = min(offset + length, size)
+        data = b"".join(iter_byte_ranges(file_id, credentials, offset, end, length))
+        decoded = _decode_range(data, offset + len(data) >= size)
+        if decoded is not None:
+            skipped, text, read = decoded
+            result["offset"] = offset = offset + skipped
+            result["encoding"] = "utf-8"
+            result["content"] = text
+        else:
+            read = len(data)
+            result["encoding"] = "base64"
+            result["content"] = base64.b64encode(data).decode("ascii")
+        result["length"] = read
+        next_byte_offset = offset + read if offset + read < size else None
+
+    result["next_byte_offset"] = next_byte_offset
+    return result
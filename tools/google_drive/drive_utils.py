@@ -2,19 +2,947 @@
 Google Drive utilities module.
 Contains common functionality used across Google Drive tools.
 """
+import datetime
+import email.utils
+import hashlib
+import itertools
 import json
-from typing import Dict, List, Any, Optional
+import os
+import random
+import re
+import shutil
+import sys
+import tempfile
+import threading
+import time
+import uuid
+import zipfile
+from collections import Counter, OrderedDict, deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, as_completed, wait
+from typing import BinaryIO, Callable, Dict, Generator, List, Any, Optional, Set
 
+import google.auth.transport.requests
+import google_auth_httplib2
+import requests
+from dify_plugin.entities.tool import ToolInvokeMessage
+import httplib2
 from google.oauth2 import service_account
-from googleapiclient.discovery import build
+from googleapiclient.discovery import build, build_from_document
+from googleapiclient.discovery_cache import get_static_doc
 from googleapiclient.errors import HttpError
-from googleapiclient.http import MediaInMemoryUpload, MediaIoBaseDownload
+from googleapiclient.http import (
+    HttpRequest,
+    MediaInMemoryUpload,
+    MediaIoBaseDownload,
+    MediaIoBaseUpload,
+    MediaUpload,
+)
 import io
 
 
+class LRUCache:
+    """
+    Small thread-safe LRU cache shared across tool invocations.
+    Bounded by entry count and, when a weigher is given, by the total weight of the values.
+    """
+
+    def __init__(self, max_size: int, max_weight: Optional[int] = None,
+                 weigher: Optional[Callable[[Any], int]] = None):
+        self.max_size = max_size
+        self.max_weight = max_weight
+        self._weigher = weigher
+        self._weight = 0
+        self._items: OrderedDict = OrderedDict()
+        self._lock = threading.RLock()
+
+    def _weigh(self, value: Any) -> int:
+        return self._weigher(value) if self._weigher else 0
+
+    def get(self, key: Any) -> Any:
+        with self._lock:
+            if key not in self._items:
+                return None
+            self._items.move_to_end(key)
+            return self._items[key]
+
+    def put(self, key: Any, value: Any) -> None:
+        with self._lock:
+            if key in self._items:
+                self._weight -= self._weigh(self._items[key])
+            self._items[key] = value
+            self._items.move_to_end(key)
+            self._weight += self._weigh(value)
+            while self._items and (
+                len(self._items) > self.max_size
+                or (self.max_weight is not None and self._weight > self.max_weight)
+            ):
+                _, evicted = self._items.popitem(last=False)
+                self._weight -= self._weigh(evicted)
+
+    def get_or_create(self, key: Any, factory: Callable[[], Any]) -> Any:
+        """
+        Return the cached value for key, creating it with factory on a miss.
+        The factory runs under the cache lock so concurrent misses build once.
+        """
+        with self._lock:
+            value = self.get(key)
+            if value is None:
+                value = factory()
+                self.put(key, value)
+            return value
+
+    def pop(self, key: Any) -> Any:
+        with self._lock:
+            if key not in self._items:
+                return None
+            value = self._items.pop(key)
+            self._weight -= self._weigh(value)
+            return value
+
+    def clear(self) -> None:
+        with self._lock:
+            self._items.clear()
+            self._weight = 0
+
+
+def _load_bundled_discovery_document() -> Optional[dict]:
+    """
+    Load and parse the Drive v3 discovery document bundled with the client library.
+    Parsing happens once at import so building a client needs no network or JSON work.
+    """
+    document = get_static_doc('drive', 'v3')
+    if document is None:
+        return None
+    return json.loads(document)
+
+
+_DRIVE_DISCOVERY_DOCUMENT = _load_bundled_discovery_document()
+
+
+class StreamingMediaUpload(MediaUpload):
+    """
+    Resumable upload media that reads from a non-seekable stream of known size.
+    Only the chunk currently being sent is kept in memory, so peak memory does
+    not depend on the size of the uploaded file. Chunks are handed out as views
+    of the buffer rather than copies.
+    """
+
+    def __init__(self, stream: BinaryIO, mimetype: str, size: int, chunksize: int):
+        super().__init__()
+        self._stream = stream
+        self._mimetype = mimetype
+        self._size = size
+        self._chunksize = chunksize
+        self._buffer = bytearray()
+        self._buffer_start = 0
+        # Whether a view of the buffer was handed out, which prevents resizing it
+        self._exported = False
+
+    def chunksize(self) -> int:
+        return self._chunksize
+
+    def mimetype(self) -> str:
+        return self._mimetype
+
+    def size(self) -> int:
+        return self._size
+
+    def resumable(self) -> bool:
+        return True
+
+    def getbytes(self, begin: int, length: int) -> memoryview:
+        # Bytes before begin have been acknowledged by Drive and can be dropped.
+        # A failed chunk is retried from the same offset, so it is still buffered.
+        if begin < self._buffer_start or begin > self._buffer_start + len(self._buffer):
+            raise ValueError(f"Cannot seek streaming upload to offset {begin}")
+        if begin > self._buffer_start:
+            # A new buffer is started instead of resizing one a previous request may still view;
+            # normally the whole chunk was acknowledged and nothing is copied
+            self._buffer = self._buffer[begin - self._buffer_start:]
+            self._buffer_start = begin
+            self._exported = False
+
+        if len(self._buffer) < length and self._exported:
+            self._buffer = bytearray(self._buffer)
+            self._exported = False
+        while len(self._buffer) < length:
+            piece = self._stream.read(length - len(self._buffer))
+            if not piece:
+                break
+            self._buffer.extend(piece)
+
+        self._exported = True
+        return memoryview(self._buffer)[:length]
+
+    def has_stream(self) -> bool:
+        return False
+
+    def stream(self) -> None:
+        return None
+
+
+def escape_query_value(value: str) -> str:
+    """
+    Escape a string for use inside a quoted value of a Drive query
+    """
+    return value.replace("\\", "\\\\").replace("'", "\\'")
+
+
+def safe_path_segment(name: str) -> str:
+    """
+    Turn a Drive file name into a single archive path segment. Drive names may contain
+    slashes or be "." or "..", which would add directory levels or escape the archive.
+    """
+    segment = re.sub(r"[/\\\x00]", "_", name or "").strip()
+    if segment in ("", ".", ".."):
+        return segment.replace(".", "_") or "_"
+    return segment
+
+
+# Reasons of 403 errors that signal rate limiting rather than missing permissions,
+# both as legacy "errors[].reason" values and as ErrorInfo detail reasons
+RATE_LIMIT_REASONS = {"userRateLimitExceeded", "rateLimitExceeded",
+                      "USER_RATE_LIMIT_EXCEEDED", "RATE_LIMIT_EXCEEDED"}
+
+# HTTP methods that can safely be sent twice
+IDEMPOTENT_METHODS = {"GET", "HEAD", "PUT", "DELETE"}
+
+
+def http_error_reasons(error: HttpError) -> Set[str]:
+    """
+    Collect every error reason of a Drive API error, e.g. {"rateLimitExceeded", "RATE_LIMIT_EXCEEDED"}.
+    Drive sends both ErrorInfo "details" and legacy "errors" entries, and googleapiclient
+    only keeps the first of them in error_details, so the body is parsed as well.
+    """
+    reasons = set()
+    details = getattr(error, "error_details", None)
+    if isinstance(details, list):
+        for detail in details:
+            if isinstance(detail, dict) and detail.get("reason"):
+                reasons.add(detail["reason"])
+    content = error.content
+    if isinstance(content, bytes):
+        content = content.decode("utf-8", errors="replace")
+    try:
+        body = json.loads(content)["error"]
+    except (ValueError, KeyError, TypeError):
+        return reasons
+    if not isinstance(body, dict):
+        return reasons
+    for key in ("errors", "details"):
+        entries = body.get(key)
+        if isinstance(entries, list):
+            for entry in entries:
+                if isinstance(entry, dict) and entry.get("reason"):
+                    reasons.add(entry["reason"])
+    return reasons
+
+
+def classify_retryable_error(error: BaseException) -> Optional[str]:
+    """
+    Classify a failed Drive call as "rate_limit", "server_error" or "connection" when
+    trying again may succeed, or return None for permanent errors.
+    Rate-limited calls were never processed, so they are safe to repeat even when
+    they are not idempotent.
+    """
+    if isinstance(error, HttpError):
+        status = error.resp.status
+        if status == 429 or (status == 403 and not http_error_reasons(error).isdisjoint(RATE_LIMIT_REASONS)):
+            return "rate_limit"
+        if status >= 500:
+            return "server_error"
+        return None
+    if isinstance(error, (ConnectionError, TimeoutError,
+                          requests.exceptions.ConnectionError, requests.exceptions.Timeout)):
+        return "connection"
+    return None
+
+
+def retry_after_seconds(error: Optional[BaseException]) -> Optional[float]:
+    """
+    Seconds to wait according to the Retry-After header of a failed call, if any
+    """
+    if not isinstance(error, HttpError):
+        return None
+    value = error.resp.get("retry-after") if hasattr(error.resp, "get") else None
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        retry_at = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max(0.0, retry_at.timestamp() - time.time())
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket. Callers reserve tokens and are told how long to wait
+    for them, so concurrent callers queue in arrival order instead of failing.
+    """
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self, tokens: float = 1) -> float:
+        """
+        Take tokens from the bucket, going into debt if needed
+        
+        Returns:
+            Seconds until the reserved tokens are available, 0 if a rate of 0 disables the bucket
+        """
+        if self.rate <= 0:
+            return 0.0
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self._tokens -= tokens
+            return -self._tokens / self.rate if self._tokens < 0 else 0.0
+
+
+class DriveRateLimiter:
+    """
+    Request shaper of one service account. Every request takes a token from the request
+    bucket, writes also from the smaller write bucket, and callers wait until both allow it.
+    """
+
+    def __init__(self, qps: float, burst: float, write_qps: float, write_burst: float):
+        self._requests = TokenBucket(qps, burst)
+        self._writes = TokenBucket(write_qps, write_burst)
+
+    @staticmethod
+    def is_write(method: str, uri: str) -> bool:
+        # Chunks of a resumable upload continue a write that was already counted
+        return method.upper() not in ("GET", "HEAD") and "upload_id=" not in uri
+
+    def acquire(self, requests: List[tuple[str, str]]) -> float:
+        """
+        Wait until the given (method, uri) requests may be sent
+        
+        Returns:
+            Seconds waited
+        """
+        writes = sum(1 for method, uri in requests if self.is_write(method, uri))
+        wait = self._requests.reserve(len(requests))
+        if writes:
+            wait = max(wait, self._writes.reserve(writes))
+        if wait > 0:
+            time.sleep(wait)
+        return wait
+
+
+class TokenRefresher:
+    """
+    Keeps the access token of credentials shared across invocations fresh.
+    Tokens close to expiry are refreshed in the background while the current one is
+    still used, missing or nearly expired tokens are refreshed before the request.
+    Only one refresh per service account runs at a time.
+    """
+
+    def __init__(self, credentials: service_account.Credentials, refresh_margin: float,
+                 background_margin: float):
+        self.credentials = credentials
+        self.refresh_margin = refresh_margin
+        self.background_margin = background_margin
+        self._refresh_lock = threading.Lock()
+
+    def expires_in(self) -> float:
+        """
+        Seconds until the current access token expires, -inf if there is none
+        """
+        expiry = self.credentials.expiry
+        if not self.credentials.token or expiry is None:
+            return float("-inf")
+        if expiry.tzinfo is None:
+            # google-auth keeps expiry as a naive UTC datetime
+            expiry = expiry.replace(tzinfo=datetime.timezone.utc)
+        return expiry.timestamp() - time.time()
+
+    def _refresh(self) -> None:
+        self.credentials.refresh(google.auth.transport.requests.Request())
+        print(f"Refreshed access token of {self.credentials.service_account_email}")
+
+    def _refresh_in_background(self) -> None:
+        if not self._refresh_lock.acquire(blocking=False):
+            return  # A refresh is already running
+
+        def run():
+            try:
+                self._refresh()
+            except Exception as e:
+                print(f"Background token refresh failed: {str(e)}")
+            finally:
+                self._refresh_lock.release()
+
+        threading.Thread(target=run, name="drive-token-refresh", daemon=True).start()
+
+    def ensure_fresh(self, wait: bool = True) -> None:
+        """
+        Refresh the token if it expires within the background margin
+        
+        Args:
+            wait: Block until a valid token is available when the token is missing or
+                expires within the refresh margin, otherwise only start a background refresh
+        """
+        expires_in = self.expires_in()
+        if expires_in > self.background_margin:
+            return
+        if not wait or expires_in > self.refresh_margin:
+            self._refresh_in_background()
+            return
+        with self._refresh_lock:
+            # A concurrent refresh may have finished while we waited
+            if self.expires_in() <= self.refresh_margin:
+                self._refresh()
+
+
+class RateLimitedHttp(google_auth_httplib2.AuthorizedHttp):
+    """
+    Authorized httplib2 transport that passes every request through a DriveRateLimiter.
+    Batch requests are shaped per sub-request by GoogleDriveUtils.execute_batch instead.
+    When a TokenRefresher is given, the access token is kept fresh before each request.
+    """
+
+    def __init__(self, credentials: service_account.Credentials, http: httplib2.Http,
+                 limiter: DriveRateLimiter, refresher: Optional[TokenRefresher] = None):
+        super().__init__(credentials, http=http)
+        self.limiter = limiter
+        self.refresher = refresher
+
+    def request(self, uri, method="GET", *args, **kwargs):
+        if "/batch/" not in uri:
+            self.limiter.acquire([(method, uri)])
+        if self.refresher is not None:
+            self.refresher.ensure_fresh()
+        return super().request(uri, method, *args, **kwargs)
+
+
+class PooledHttp:
+    """
+    httplib2-compatible transport over a google.auth AuthorizedSession, shared by all
+    threads using one service account. The session's connection pool keeps TLS
+    connections alive across invocations, so requests reuse warm connections instead
+    of handshaking on every new thread. Requests are shaped like RateLimitedHttp.
+    """
+
+    def __init__(self, credentials: service_account.Credentials, limiter: DriveRateLimiter,
+                 refresher: Optional[TokenRefresher] = None, pool_size: int = 10,
+                 timeout: Optional[float] = None):
+        self.credentials = credentials
+        self.limiter = limiter
+        self.refresher = refresher
+        self.timeout = timeout
+        self.session = google.auth.transport.requests.AuthorizedSession(credentials)
+        adapter = requests.adapters.HTTPAdapter(pool_connections=4, pool_maxsize=pool_size)
+        self.session.mount("https://", adapter)
+
+    def request(self, uri, method="GET", body=None, headers=None, redirections=None,
+                connection_type=None):
+        if "/batch/" not in uri:
+            self.limiter.acquire([(method, uri)])
+        if self.refresher is not None:
+            self.refresher.ensure_fresh()
+        response = self.session.request(method, uri, data=body, headers=headers, timeout=self.timeout)
+        content = response.content
+
+        # Present the response like httplib2 does: lowercase headers, status as a
+        # header, and no encoding headers once requests has decoded the body
+        info = {key.lower(): value for key, value in response.headers.items()}
+        info["status"] = str(response.status_code)
+        if "content-encoding" in info:
+            info["-content-encoding"] = info.pop("content-encoding")
+            info["content-length"] = str(len(content))
+        resp = httplib2.Response(info)
+        resp.reason = response.reason
+        return resp, content
+
+    def close(self) -> None:
+        self.session.close()
+
+
+class RetryStats:
+    """Thread-safe counters of retried and given-up Drive calls."""
+
+    def __init__(self):
+        self._counts: Counter = Counter()
+        self._lock = threading.Lock()
+
+    def increment(self, name: str) -> None:
+        with self._lock:
+            self._counts[name] += 1
+
+    def snapshot(self) -> Dict[str, int]:
+        with self._lock:
+            return dict(self._counts)
+
+    def reset(self) -> None:
+        with self._lock:
+            self._counts.clear()
+
+
+# MIME types of the file_type filters accepted by the search tools
+FILE_TYPE_MIME_TYPES = {
+    "folder": "application/vnd.google-apps.folder",
+    "document": "application/vnd.google-apps.document",
+    "spreadsheet": "application/vnd.google-apps.spreadsheet",
+    "presentation": "application/vnd.google-apps.presentation",
+}
+
+# Export formats of Google Workspace files as (MIME type, file extension)
+EXPORT_FORMATS = {
+    "pdf": ("application/pdf", "pdf"),
+    "text": ("text/plain", "txt"),
+    "markdown": ("text/markdown", "md"),
+    "docx": ("application/vnd.openxmlformats-officedocument.wordprocessingml.document", "docx"),
+    "xlsx": ("application/vnd.openxmlformats-officedocument.spreadsheetml.sheet", "xlsx"),
+    "csv": ("text/csv", "csv"),
+    "pptx": ("application/vnd.openxmlformats-officedocument.presentationml.presentation", "pptx"),
+}
+
+# Export formats supported per Google Workspace type, the first one is the cheapest text form
+WORKSPACE_EXPORT_FORMATS = {
+    "application/vnd.google-apps.document": ["text", "markdown", "docx", "pdf"],      # Google Docs
+    "application/vnd.google-apps.spreadsheet": ["csv", "xlsx", "pdf"],                # Google Sheets
+    "application/vnd.google-apps.presentation": ["text", "pptx", "pdf"],              # Google Slides
+    "application/vnd.google-apps.drawing": ["pdf"],                                   # Google Drawings
+    "application/vnd.google-apps.script": ["pdf"],                                    # Google Apps Script
+    "application/vnd.google-apps.form": ["pdf"],                                      # Google Forms
+}
+
+# Drive metadata fields needed to download or export a file and to identify its revision
+DOWNLOAD_FIELDS = 'id, name, mimeType, size, md5Checksum, headRevisionId, modifiedTime'
+
+# Size of blob chunk messages, matching the chunking of the plugin runtime
+BLOB_CHUNK_SIZE = 8192
+
+
+def create_blob_chunk_messages(fileobj: BinaryIO, size: int,
+                               meta: Optional[dict] = None) -> Generator[ToolInvokeMessage, None, None]:
+    """
+    Stream the content of a file object as blob chunk messages.
+    Unlike a single blob message, the content is never materialized as one bytes object.
+    """
+    blob_id = uuid.uuid4().hex
+    sequence = 0
+    while True:
+        chunk = fileobj.read(BLOB_CHUNK_SIZE)
+        if not chunk:
+            break
+        yield ToolInvokeMessage(
+            type=ToolInvokeMessage.MessageType.BLOB_CHUNK,
+            message=ToolInvokeMessage.BlobChunkMessage(
+                id=blob_id, sequence=sequence, total_length=size, blob=chunk, end=False
+            ),
+            meta=meta,
+        )
+        sequence += 1
+
+    yield ToolInvokeMessage(
+        type=ToolInvokeMessage.MessageType.BLOB_CHUNK,
+        message=ToolInvokeMessage.BlobChunkMessage(
+            id=blob_id, sequence=sequence, total_length=size, blob=b"", end=True
+        ),
+        meta=meta,
+    )
+
+
+class FolderPathCache:
+    """
+    Cache of resolved folder path segments with a time-to-live on every entry.
+    Entries map (root key, parent folder ID, segment name) to the child folder ID, so a
+    path is walked from its base folder like a trie; the entries are bounded by an LRU
+    and an expired entry is dropped when it is next looked up.
+    Lookups of the same child segment are serialized on a striped lock, so concurrent
+    callers resolving the same path never create duplicate folders.
+    """
+
+    # Number of locks segment lookups are spread over
+    LOCK_STRIPES = 64
+
+    def __init__(self, ttl: float, max_entries: int):
+        self.ttl = ttl
+        self._entries = LRUCache(max_entries)
+        self._segment_locks = [threading.Lock() for _ in range(self.LOCK_STRIPES)]
+
+    def _lookup(self, key: tuple) -> Optional[str]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        folder_id, expires_at = entry
+        if expires_at < time.monotonic():
+            self._entries.pop(key)
+            return None
+        return folder_id
+
+    def resolve(self, root_key: tuple, base_id: str, segments: List[str],
+                resolve_segment: Callable[[str, str], str]) -> str:
+        """
+        Resolve segments below base_id, calling resolve_segment(parent_id, name)
+        only for segments that are missing or expired in the cache.
+        """
+        folder_id = base_id
+        for segment in segments:
+            key = (root_key, folder_id, segment)
+            child_id = self._lookup(key)
+            if child_id is None:
+                with self._segment_locks[hash(key) % self.LOCK_STRIPES]:
+                    # Another caller may have resolved the segment while we waited
+                    child_id = self._lookup(key)
+                    if child_id is None:
+                        child_id = resolve_segment(folder_id, segment)
+                        self._entries.put(key, (child_id, time.monotonic() + self.ttl))
+            folder_id = child_id
+
+        return folder_id
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+
+class DiskLRUCache:
+    """
+    Size-bounded LRU cache of file contents on local disk, shared across tool invocations.
+    Recency is tracked with file modification times, so the cache survives plugin restarts.
+    """
+
+    # Unfinished writes older than this many seconds are left over from a crash
+    STALE_TEMP_AGE = 3600
+
+    def __init__(self, directory: str, max_bytes: int, max_entry_bytes: Optional[int] = None):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.max_entry_bytes = max_entry_bytes or max_bytes
+        self._entries: Optional[OrderedDict] = None
+        self._total = 0
+        self._lock = threading.Lock()
+
+    def _load(self) -> None:
+        # Index the cache directory on first use, least recently used entries first
+        if self._entries is not None:
+            return
+        os.makedirs(self.directory, exist_ok=True)
+        found = []
+        for entry in os.scandir(self.directory):
+            stat = entry.stat()
+            if entry.name.endswith(".tmp"):
+                if stat.st_mtime < time.time() - self.STALE_TEMP_AGE:
+                    os.remove(entry.path)
+            elif entry.is_file():
+                found.append((stat.st_mtime, entry.name, stat.st_size))
+        found.sort()
+        self._entries = OrderedDict((name, size) for _, name, size in found)
+        self._total = sum(self._entries.values())
+
+    @staticmethod
+    def _entry_name(key: tuple) -> str:
+        return hashlib.sha256(json.dumps(key).encode("utf-8")).hexdigest()
+
+    def open(self, key: tuple) -> Optional[BinaryIO]:
+        """
+        Open the cached content of key for reading, or return None on a miss
+        """
+        if self.max_bytes <= 0:
+            return None
+        name = self._entry_name(key)
+        path = os.path.join(self.directory, name)
+        with self._lock:
+            self._load()
+            try:
+                # Touch the entry before opening it, so a failure leaves no handle open
+                os.utime(path)
+                fileobj = open(path, "rb")
+            except FileNotFoundError:
+                # Evicted or never written, possibly by another process sharing the directory
+                self._total -= self._entries.pop(name, 0)
+                return None
+            try:
+                if name not in self._entries:
+                    self._entries[name] = os.fstat(fileobj.fileno()).st_size
+                    self._total += self._entries[name]
+                self._entries.move_to_end(name)
+            except BaseException:
+                fileobj.close()
+                raise
+            return fileobj
+
+    def put(self, key: tuple, fileobj: BinaryIO, size: int) -> bool:
+        """
+        Copy the rest of fileobj into the cache under key and evict least recently used entries.
+        Content larger than max_entry_bytes is not cached.
+        
+        Returns:
+            True if the content was cached
+        """
+        if self.max_bytes <= 0 or size > min(self.max_entry_bytes, self.max_bytes):
+            return False
+        name = self._entry_name(key)
+        with self._lock:
+            self._load()
+
+        # Write to a temporary file first so readers never see a partial entry
+        fd, temp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as temp_file:
+                shutil.copyfileobj(fileobj, temp_file)
+            os.replace(temp_path, os.path.join(self.directory, name))
+        except BaseException:
+            os.remove(temp_path)
+            raise
+
+        with self._lock:
+            self._total -= self._entries.pop(name, 0)
+            self._entries[name] = size
+            self._total += size
+            while self._total > self.max_bytes and self._entries:
+                evicted, evicted_size = self._entries.popitem(last=False)
+                self._total -= evicted_size
+                try:
+                    os.remove(os.path.join(self.directory, evicted))
+                except FileNotFoundError:
+                    pass
+        return True
+
+    def clear(self) -> None:
+        with self._lock:
+            self._load()
+            for name in self._entries:
+                try:
+                    os.remove(os.path.join(self.directory, name))
+                except FileNotFoundError:
+                    pass
+            self._entries.clear()
+            self._total = 0
+
+
+def open_dify_file(file_url: str) -> requests.Response:
+    """
+    Open a streaming response for a file URL handed over by Dify
+    
+    Raises:
+        requests.RequestException: If the file cannot be fetched
+    """
+    # Check if URL starts with /files and prepend appropriate URL
+    download_url = file_url
+    if file_url.startswith('/files'):
+        # For Docker environment: use api service name instead of localhost
+        # This assumes plugin is running in the same Docker network as Dify
+        download_url = f"http://api:5001{file_url}"
+        print(f"URL starts with /files, using Docker network URL: {download_url}")
+    
+    print(f"Streaming file from URL: {download_url}")
+    # Ask for an unencoded body so Content-Length matches the uploaded bytes
+    response = requests.get(download_url, stream=True, headers={"Accept-Encoding": "identity"})
+    response.raise_for_status()  # Raise exception for non-200 status codes
+    return response
+
+
+def get_file_attributes(file_data: Any) -> tuple[str, str, str]:
+    """
+    Read (filename, mime_type, url) from a Dify file given as a dictionary or an object
+    """
+    if isinstance(file_data, dict):
+        return file_data.get('filename') or '', file_data.get('mime_type') or '', file_data.get('url') or ''
+    return (
+        str(getattr(file_data, 'filename', '') or ''),
+        str(getattr(file_data, 'mime_type', '') or ''),
+        str(getattr(file_data, 'url', '') or '')
+    )
+
+
+def parse_int(value: Any, default: Optional[int], minimum: int = 0) -> Optional[int]:
+    """
+    Read an optional integer tool parameter, falling back to default when empty or invalid
+    """
+    if value in (None, ""):
+        return default
+    try:
+        return max(minimum, int(value))
+    except (TypeError, ValueError):
+        return default
+
+
+def credentials_fingerprint(credentials: service_account.Credentials) -> str:
+    """
+    Stable fingerprint of a service account credential, used as a cache key.
+    """
+    key_id = getattr(credentials.signer, "key_id", None) or ""
+    scopes = ",".join(sorted(credentials.scopes or []))
+    raw = f"{credentials.service_account_email}|{key_id}|{scopes}"
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
 class GoogleDriveUtils:
     """Utilities for Google Drive operations."""
 
+    # Maximum number of distinct service accounts kept warm in this process
+    CACHE_MAX_ENTRIES = 16
+    # Build clients from the pre-parsed bundled discovery document when available
+    USE_BUNDLED_DISCOVERY = True
+    # Chunk size of resumable uploads, must be a multiple of 256 KB
+    UPLOAD_CHUNK_SIZE = 8 * 1024 * 1024
+    # Chunk size of media downloads
+    DOWNLOAD_CHUNK_SIZE = 8 * 1024 * 1024
+    # Downloaded content above this size is spooled to a temporary file on disk
+    SPOOL_MAX_MEMORY = 16 * 1024 * 1024
+    # Binary files from this size on are downloaded as concurrent byte ranges
+    PARALLEL_DOWNLOAD_THRESHOLD = 64 * 1024 * 1024
+    # Size of each byte range and number of ranges fetched concurrently
+    PARALLEL_DOWNLOAD_PART_SIZE = 8 * 1024 * 1024
+    PARALLEL_DOWNLOAD_WORKERS = 4
+    # Page size of file listings, the Drive API caps it at 1000
+    SEARCH_PAGE_SIZE = 1000
+    # Number of files uploaded concurrently by a bulk upload, and its upper bound: each upload
+    # holds about two chunks (its chunk buffer and the piece being read into it), which must
+    # fit the memory budget of bulk uploads within the plugin's memory limit
+    BULK_UPLOAD_WORKERS = 4
+    BULK_UPLOAD_MEMORY_BUDGET = 64 * 1024 * 1024
+    BULK_UPLOAD_MAX_WORKERS = max(1, BULK_UPLOAD_MEMORY_BUDGET // (2 * UPLOAD_CHUNK_SIZE))
+    # Number of files downloaded concurrently into a folder archive, and its upper bound
+    # keeping the download buffers of all workers well within the plugin's memory limit
+    FOLDER_ARCHIVE_WORKERS = 4
+    FOLDER_ARCHIVE_MAX_WORKERS = 4
+    # Total size of the files being downloaded or waiting to be archived at a time
+    FOLDER_ARCHIVE_MAX_PENDING_BYTES = 256 * 1024 * 1024
+    # Maximum number of sub-requests the Drive batch endpoint accepts per HTTP round trip
+    BATCH_MAX_SIZE = 100
+    # Number of folders whose children are listed by one combined "in parents" query, and
+    # number of those queries run concurrently while walking a folder tree level by level
+    TREE_PARENTS_PER_QUERY = 50
+    TREE_LIST_WORKERS = 8
+    # Number of folder statistics kept, each valid until the next change in Drive
+    FOLDER_STATS_CACHE_ENTRIES = 64
+
+    # Seconds a resolved folder path stays cached, and number of path segments kept
+    FOLDER_PATH_CACHE_TTL = 300
+    FOLDER_PATH_CACHE_ENTRIES = 4096
+    # Number of retries of a transient failure, and bounds in seconds of the exponential backoff
+    RETRY_MAX_ATTEMPTS = 5
+    RETRY_BASE_DELAY = 1.0
+    RETRY_MAX_DELAY = 32.0
+    # Requests per second and burst size allowed per service account, and the separate
+    # budget of writes (creates, updates, deletes); a rate of 0 disables the limit
+    RATE_LIMIT_QPS = 100
+    RATE_LIMIT_BURST = 50
+    RATE_LIMIT_WRITE_QPS = 3
+    RATE_LIMIT_WRITE_BURST = 10
+    # Access tokens are refreshed in the background once they expire within the background
+    # margin, and before the next request once they expire within the refresh margin (seconds)
+    TOKEN_BACKGROUND_REFRESH_MARGIN = 900
+    TOKEN_REFRESH_MARGIN = 300
+    # Share one keep-alive connection pool per service account across threads and
+    # invocations instead of a separate httplib2 transport per thread
+    USE_POOLED_TRANSPORT = True
+    # Maximum number of pooled connections kept per service account, and request timeout in seconds
+    HTTP_POOL_SIZE = 32
+    HTTP_TIMEOUT = 120
+    # Directory and size bound of the download cache, 0 disables it
+    DOWNLOAD_CACHE_DIR = os.path.join(tempfile.gettempdir(), "dify_google_drive", "downloads")
+    DOWNLOAD_CACHE_MAX_BYTES = 512 * 1024 * 1024
+    # Downloads larger than this are not cached so one big file cannot flush the cache
+    DOWNLOAD_CACHE_MAX_ENTRY_BYTES = 64 * 1024 * 1024
+    # Default and maximum edge length in pixels of fetched thumbnails
+    THUMBNAIL_SIZE = 220
+    THUMBNAIL_MAX_SIZE = 1600
+
+    _credentials_cache = LRUCache(CACHE_MAX_ENTRIES)
+    _service_cache = LRUCache(CACHE_MAX_ENTRIES)
+    _rate_limiters = LRUCache(CACHE_MAX_ENTRIES)
+    _token_refreshers = LRUCache(CACHE_MAX_ENTRIES)
+    _pooled_transports = LRUCache(CACHE_MAX_ENTRIES)
+    _thread_local = threading.local()
+    _retry_stats = RetryStats()
+    _folder_path_cache = FolderPathCache(FOLDER_PATH_CACHE_TTL, FOLDER_PATH_CACHE_ENTRIES)
+    _folder_stats_cache = LRUCache(FOLDER_STATS_CACHE_ENTRIES)
+    _download_cache = DiskLRUCache(DOWNLOAD_CACHE_DIR, DOWNLOAD_CACHE_MAX_BYTES, DOWNLOAD_CACHE_MAX_ENTRY_BYTES)
+
+    @staticmethod
+    def _retry_delay(attempt: int, error: Optional[BaseException] = None) -> Optional[float]:
+        """
+        Seconds to wait before the next attempt, at most RETRY_MAX_DELAY. Returns None when
+        Retry-After asks for a longer wait, which would outlast the tool call, so the caller
+        gives up instead of sleeping.
+        """
+        # Full jitter keeps concurrent callers from retrying in lockstep
+        backoff = random.uniform(0, min(GoogleDriveUtils.RETRY_MAX_DELAY,
+                                        GoogleDriveUtils.RETRY_BASE_DELAY * 2 ** attempt))
+        retry_after = retry_after_seconds(error)
+        if retry_after is None:
+            return backoff
+        if retry_after > GoogleDriveUtils.RETRY_MAX_DELAY:
+            return None
+        return max(backoff, retry_after)
+
+    @staticmethod
+    def call_with_retry(call: Callable[[], Any], idempotent: bool) -> Any:
+        """
+        Run a Drive call, retrying transient failures with exponential backoff and full
+        jitter, honoring Retry-After. Rate-limited calls are always retried, server and
+        connection errors only when the call is idempotent.
+        
+        Args:
+            call: Function performing the call, e.g. request.execute or request.next_chunk
+            idempotent: Whether the call may safely run more than once
+            
+        Returns:
+            Result of the call
+        """
+        attempt = 0
+        while True:
+            try:
+                return call()
+            except Exception as error:
+                reason = classify_retryable_error(error)
+                if reason is None or (reason != "rate_limit" and not idempotent):
+                    raise
+                if attempt >= GoogleDriveUtils.RETRY_MAX_ATTEMPTS:
+                    GoogleDriveUtils._retry_stats.increment("give_ups")
+                    print(f"Giving up Drive call after {attempt} retries: {error}")
+                    raise
+                delay = GoogleDriveUtils._retry_delay(attempt, error)
+                if delay is None:
+                    GoogleDriveUtils._retry_stats.increment("give_ups")
+                    print(f"Giving up Drive call, Retry-After exceeds {GoogleDriveUtils.RETRY_MAX_DELAY}s: {error}")
+                    raise
+                attempt += 1
+                GoogleDriveUtils._retry_stats.increment("retries")
+                GoogleDriveUtils._retry_stats.increment(f"retries_{reason}")
+                print(f"Retrying Drive call after {reason} in {delay:.1f}s "
+                      f"(attempt {attempt} of {GoogleDriveUtils.RETRY_MAX_ATTEMPTS})")
+                time.sleep(delay)
+
+    @staticmethod
+    def execute(request: Any, idempotent: Optional[bool] = None) -> Any:
+        """
+        Execute a Drive API request through call_with_retry
+        
+        Args:
+            request: HttpRequest or BatchHttpRequest to execute
+            idempotent: Whether the request may safely be sent twice,
+                by default True for GET, HEAD, PUT and DELETE requests
+            
+        Returns:
+            Response of the request
+        """
+        if idempotent is None:
+            idempotent = getattr(request, "method", "POST").upper() in IDEMPOTENT_METHODS
+        return GoogleDriveUtils.call_with_retry(request.execute, idempotent)
+
+    @staticmethod
+    def get_retry_stats() -> Dict[str, int]:
+        """
+        Counters of Drive call retries in this process: retries, retries per reason
+        (retries_rate_limit, retries_server_error, retries_connection) and give_ups
+        """
+        return GoogleDriveUtils._retry_stats.snapshot()
+
     @staticmethod
     def get_credentials(credentials_json: str) -> service_account.Credentials:
         """
@@ -28,7 +956,18 @@ class GoogleDriveUtils:
             
         Raises:
             ValueError: If the JSON is invalid or missing required fields
+        
+        Credentials and their access token are shared per service account across
+        invocations. A token close to expiry is refreshed in the background here,
+        so the tool's first Drive call does not wait for a token exchange.
         """
+        # Reuse parsed credentials for the same service account JSON
+        cache_key = hashlib.sha256(credentials_json.encode("utf-8")).hexdigest()
+        cached = GoogleDriveUtils._credentials_cache.get(cache_key)
+        if cached is not None:
+            GoogleDriveUtils.get_token_refresher(cached).ensure_fresh(wait=False)
+            return cached
+
         # Parse the JSON credentials
         try:
             service_account_info = json.loads(credentials_json)
@@ -47,7 +986,24 @@ class GoogleDriveUtils:
             scopes=['https://www.googleapis.com/auth/drive']
         )
         
-        return creds
+        # Share one credentials object, and so one access token, per service account
+        refresher = GoogleDriveUtils.get_token_refresher(creds)
+        refresher.ensure_fresh(wait=False)
+        GoogleDriveUtils._credentials_cache.put(cache_key, refresher.credentials)
+        return refresher.credentials
+
+    @staticmethod
+    def get_token_refresher(credentials: service_account.Credentials) -> TokenRefresher:
+        """
+        Get the token refresher of the service account of the given credentials
+        """
+        return GoogleDriveUtils._token_refreshers.get_or_create(
+            credentials_fingerprint(credentials),
+            lambda: TokenRefresher(
+                credentials, GoogleDriveUtils.TOKEN_REFRESH_MARGIN,
+                GoogleDriveUtils.TOKEN_BACKGROUND_REFRESH_MARGIN
+            )
+        )
     
     @staticmethod
     def get_drive_service(credentials: service_account.Credentials) -> Any:
@@ -59,10 +1015,80 @@ class GoogleDriveUtils:
             
         Returns:
             Google Drive service object
+        
+        The service is built once per service account and cached for the
+        lifetime of the plugin process. Requests made through the shared service
+        use the pooled transport of the service account, or a per-thread httplib2
+        transport when USE_POOLED_TRANSPORT is off since httplib2 is not thread-safe.
+        """
+        def request_builder(http, *args, **kwargs):
+            return HttpRequest(GoogleDriveUtils._get_http(credentials), *args, **kwargs)
+
+        def factory():
+            http = GoogleDriveUtils._get_http(credentials)
+            if GoogleDriveUtils.USE_BUNDLED_DISCOVERY and _DRIVE_DISCOVERY_DOCUMENT is not None:
+                return build_from_document(
+                    _DRIVE_DISCOVERY_DOCUMENT,
+                    http=http,
+                    requestBuilder=request_builder
+                )
+            return build(
+                'drive', 'v3',
+                http=http,
+                requestBuilder=request_builder,
+                cache_discovery=False
+            )
+
+        return GoogleDriveUtils._service_cache.get_or_create(
+            credentials_fingerprint(credentials), factory
+        )
+
+    @staticmethod
+    def get_rate_limiter(credentials: service_account.Credentials) -> DriveRateLimiter:
+        """
+        Get the request shaper shared by all threads using the given service account
+        """
+        return GoogleDriveUtils._rate_limiters.get_or_create(
+            credentials_fingerprint(credentials),
+            lambda: DriveRateLimiter(
+                GoogleDriveUtils.RATE_LIMIT_QPS, GoogleDriveUtils.RATE_LIMIT_BURST,
+                GoogleDriveUtils.RATE_LIMIT_WRITE_QPS, GoogleDriveUtils.RATE_LIMIT_WRITE_BURST
+            )
+        )
+
+    @staticmethod
+    def _get_http(credentials: service_account.Credentials) -> Any:
         """
-        # Create and return the service
-        service = build('drive', 'v3', credentials=credentials)
-        return service
+        Get the HTTP transport for requests of the given credentials
+        """
+        if not GoogleDriveUtils.USE_POOLED_TRANSPORT:
+            return GoogleDriveUtils._get_thread_http(credentials)
+        return GoogleDriveUtils._pooled_transports.get_or_create(
+            credentials_fingerprint(credentials),
+            lambda: PooledHttp(
+                credentials, GoogleDriveUtils.get_rate_limiter(credentials),
+                GoogleDriveUtils.get_token_refresher(credentials),
+                GoogleDriveUtils.HTTP_POOL_SIZE, GoogleDriveUtils.HTTP_TIMEOUT
+            )
+        )
+
+    @staticmethod
+    def _get_thread_http(credentials: service_account.Credentials) -> RateLimitedHttp:
+        """
+        Get the authorized, rate-limited HTTP transport of the current thread for the given credentials
+        """
+        transports = getattr(GoogleDriveUtils._thread_local, "transports", None)
+        if transports is None:
+            transports = GoogleDriveUtils._thread_local.transports = {}
+        fingerprint = credentials_fingerprint(credentials)
+        http = transports.get(fingerprint)
+        if http is None:
+            http = RateLimitedHttp(
+                credentials, httplib2.Http(), GoogleDriveUtils.get_rate_limiter(credentials),
+                GoogleDriveUtils.get_token_refresher(credentials)
+            )
+            transports[fingerprint] = http
+        return http
     
     @staticmethod
     def find_folder_by_name(folder_name: str, credentials: service_account.Credentials, 
@@ -77,32 +1103,30 @@ class GoogleDriveUtils:
             
         Returns:
             Folder ID if found, empty string otherwise
+            
+        Raises:
+            HttpError: If the lookup fails, so a failed lookup is never mistaken for a missing folder
         """
         service = GoogleDriveUtils.get_drive_service(credentials)
         
         # Search for the folder within the specified parent
-        query = f"mimeType = 'application/vnd.google-apps.folder' and name = '{folder_name}' and trashed = false"
+        # Always constrain the parent, without it a root lookup would match a folder
+        # of that name anywhere in Drive, including folders shared with the account
+        query = (f"mimeType = 'application/vnd.google-apps.folder' and "
+                 f"name = '{escape_query_value(folder_name)}' and "
+                 f"'{parent_id or 'root'}' in parents and trashed = false")
         
-        # Add parent folder constraint if specified (not root)
-        if parent_id and parent_id != "root":
-            query += f" and '{parent_id}' in parents"
+        print(f"Searching for folder with query: {query}")
+        response = GoogleDriveUtils.execute(service.files().list(
+            q=query,
+            spaces='drive',
+            fields='files(id, name, parents)',
+            pageSize=1
+        ))
         
-        try:
-            print(f"Searching for folder with query: {query}")
-            response = service.files().list(
-                q=query,
-                spaces='drive',
-                fields='files(id, name, parents)',
-                pageSize=1
-            ).execute()
-            
-            items = response.get('files', [])
-            
-            if items:
-                return items[0]['id']
-        except Exception as e:
-            print(f"Error finding folder: {str(e)}")
-            
+        items = response.get('files', [])
+        if items:
+            return items[0]['id']
         return ""
     
     @staticmethod
@@ -135,10 +1159,10 @@ class GoogleDriveUtils:
         # Create the folder
         try:
             print(f"Creating folder '{name}' with parent ID: {parent_id}")
-            folder = service.files().create(
+            folder = GoogleDriveUtils.execute(service.files().create(
                 body=folder_metadata,
                 fields='id, name, webViewLink, parents'
-            ).execute()
+            ))
             
             print(f"Folder created: {folder}")
             return folder
@@ -146,6 +1170,100 @@ class GoogleDriveUtils:
             print(f"Error creating folder: {str(e)}")
             return {}
     
+    @staticmethod
+    def resolve_folder_path(path: str, credentials: service_account.Credentials,
+                            parent_id: str = "root") -> str:
+        """
+        Resolve a slash-separated folder path like "reports/2026/q3" to a folder ID,
+        creating missing folders along the way (mkdir -p semantics)
+        
+        Resolved segments are cached for FOLDER_PATH_CACHE_TTL seconds and concurrent
+        lookups of the same segment are coalesced. A folder is only created when the
+        lookup succeeded and found none.
+        
+        Args:
+            path: Slash-separated folder path, a single folder name is a one-segment path
+            credentials: Google service account credentials
+            parent_id: ID of the folder the path starts from (default: "root")
+            
+        Returns:
+            ID of the last folder in the path
+            
+        Raises:
+            ValueError: If the path is empty or a folder could not be created
+            HttpError: If looking up a folder fails
+        """
+        segments = [segment.strip() for segment in path.split("/") if segment.strip()]
+        if not segments:
+            raise ValueError(f"Invalid folder path: '{path}'")
+        base_id = parent_id or "root"
+        
+        def resolve_segment(segment_parent_id: str, name: str) -> str:
+            folder_id = GoogleDriveUtils.find_folder_by_name(name, credentials, segment_parent_id)
+            if folder_id:
+                print(f"Found existing folder: {name} with ID: {folder_id}")
+                return folder_id
+            print(f"Folder not found, creating new folder: {name}")
+            folder = GoogleDriveUtils.create_folder(name, segment_parent_id, credentials)
+            if not folder:
+                raise ValueError(f"Error creating folder: {name}")
+            return folder["id"]
+        
+        return GoogleDriveUtils._folder_path_cache.resolve(
+            (credentials_fingerprint(credentials), base_id), base_id, segments, resolve_segment
+        )
+
+    @staticmethod
+    def find_files_by_name(name: str, parent_id: str,
+                           credentials: service_account.Credentials) -> List[Dict]:
+        """
+        Find the non-folder files with exactly the given name directly inside a folder
+        
+        Args:
+            name: Name of the files to find
+            parent_id: ID of the folder to search in (use "root" for Drive root)
+            credentials: Google service account credentials
+            
+        Returns:
+            List of file details including id, name, webViewLink, size and md5Checksum
+        """
+        service = GoogleDriveUtils.get_drive_service(credentials)
+        query = (f"name = '{escape_query_value(name)}' and '{parent_id or 'root'}' in parents and "
+                 f"mimeType != 'application/vnd.google-apps.folder' and trashed = false")
+        response = GoogleDriveUtils.execute(service.files().list(
+            q=query,
+            spaces='drive',
+            fields='files(id, name, webViewLink, mimeType, size, md5Checksum)',
+            pageSize=GoogleDriveUtils.SEARCH_PAGE_SIZE
+        ))
+        return response.get('files', [])
+
+    @staticmethod
+    def _spool_stream(stream: BinaryIO, chunk_size: int) -> tuple[BinaryIO, int, str]:
+        """
+        Copy a stream into a temporary file that stays in memory up to one chunk,
+        computing the MD5 checksum of the content on the way
+        
+        Returns:
+            tuple: (spool_positioned_at_start, size, md5_hex_digest)
+        """
+        spool = tempfile.SpooledTemporaryFile(max_size=chunk_size)
+        md5 = hashlib.md5()
+        size = 0
+        try:
+            while True:
+                piece = stream.read(chunk_size)
+                if not piece:
+                    break
+                md5.update(piece)
+                spool.write(piece)
+                size += len(piece)
+        except BaseException:
+            spool.close()
+            raise
+        spool.seek(0)
+        return spool, size, md5.hexdigest()
+
     @staticmethod
     def create_file(name: str, parent_id: str, mime_type: str, content: bytes, 
                    credentials: service_account.Credentials) -> dict:
@@ -179,148 +1297,1143 @@ class GoogleDriveUtils:
         media = MediaInMemoryUpload(content, mimetype=mime_type)
         
         # Create the file
-        file = service.files().create(
+        file = GoogleDriveUtils.execute(service.files().create(
             body=file_metadata,
             media_body=media,
             fields='id, name, webViewLink, mimeType'
-        ).execute()
+        ))
         
         return file
 
     @staticmethod
-    def search_files(query: str, max_results: int, credentials: service_account.Credentials, 
-                     parent_id: Optional[str] = None, file_type: Optional[str] = None) -> List[Dict]:
+    def upload_file_stream(name: str, parent_id: str, mime_type: str, stream: BinaryIO,
+                           size: Optional[int], credentials: service_account.Credentials,
+                           chunk_size: Optional[int] = None, dedupe: bool = False) -> dict:
         """
-        Search for files in Google Drive
+        Upload a file to Google Drive from a stream using a resumable upload session
         
         Args:
-            query: Search query string
-            max_results: Maximum number of results to return
+            name: Name of the file to create
+            parent_id: ID of the parent folder (use "root" for Drive root)
+            mime_type: MIME type of the file
+            stream: Readable binary stream with the file content
+            size: Total size of the content in bytes, or None if unknown
             credentials: Google service account credentials
-            parent_id: Optional parent folder ID to search within
-            file_type: Optional file type filter
+            chunk_size: Size of each uploaded chunk (default: UPLOAD_CHUNK_SIZE)
+            dedupe: Return an existing file with the same name and content in the
+                folder instead of uploading a copy
             
         Returns:
-            List of dictionaries with file details
+            Dictionary with file details including id, name, webViewLink.
+            A reused existing file also has "deduplicated" set to True.
+        
+        When the size is unknown the stream is first spooled to a temporary file
+        that only stays in memory up to one chunk. With dedupe the stream is only
+        spooled and hashed when the folder holds a same-name file of matching size,
+        and the upload then reads from the spool.
         """
         service = GoogleDriveUtils.get_drive_service(credentials)
+        chunk_size = chunk_size or GoogleDriveUtils.UPLOAD_CHUNK_SIZE
         
-        # Build query
-        search_query = f"name contains '{query}' and trashed=false"
-        
-        # Add file type filter if specified
-        if file_type:
-            if file_type.lower() == "folder":
-                search_query += " and mimeType='application/vnd.google-apps.folder'"
-            elif file_type.lower() == "document":
-                search_query += " and mimeType='application/vnd.google-apps.document'"
-            elif file_type.lower() == "spreadsheet":
-                search_query += " and mimeType='application/vnd.google-apps.spreadsheet'"
-            elif file_type.lower() == "presentation":
-                search_query += " and mimeType='application/vnd.google-apps.presentation'"
-        
-        # Add parent folder filter if specified
-        if parent_id:
-            search_query += f" and '{parent_id}' in parents"
-        
-        print(f"Search query: {search_query}")
+        file_metadata = {
+            'name': name,
+            'parents': [parent_id] if parent_id and parent_id != "root" else ["root"]
+        }
         
-        # Execute search
-        response = service.files().list(
-            q=search_query,
-            spaces='drive',
-            fields='files(id, name, mimeType, parents)',
-            pageSize=max_results
-        ).execute()
-        
-        # Process results
-        results = []
-        for file in response.get('files', []):
-            parent_id = file.get('parents', ['root'])[0] if 'parents' in file else 'root'
-            results.append({
-                'id': file.get('id'),
-                'name': file.get('name'),
-                'mime_type': file.get('mimeType'),
-                'parent_id': parent_id
-            })
+        spool = None
+        try:
+            if dedupe:
+                candidates = [
+                    file for file in GoogleDriveUtils.find_files_by_name(name, parent_id, credentials)
+                    if file.get("md5Checksum") and (size is None or int(file.get("size", -1)) == size)
+                ]
+                if candidates:
+                    spool, size, md5_checksum = GoogleDriveUtils._spool_stream(stream, chunk_size)
+                    for existing in candidates:
+                        if existing["md5Checksum"] == md5_checksum:
+                            print(f"Identical file '{name}' already exists with ID: {existing['id']}")
+                            return {**existing, "deduplicated": True}
+                    stream = spool
             
-        return results
+            if size is not None:
+                media = StreamingMediaUpload(stream, mime_type, size, chunk_size)
+            else:
+                spool, _, _ = GoogleDriveUtils._spool_stream(stream, chunk_size)
+                media = MediaIoBaseUpload(spool, mimetype=mime_type, chunksize=chunk_size, resumable=True)
+            
+            request = service.files().create(
+                body=file_metadata,
+                media_body=media,
+                fields='id, name, webViewLink, mimeType, size'
+            )
+            
+            # A failed chunk is resumed from the last byte the server acknowledged
+            file = None
+            while file is None:
+                status, file = GoogleDriveUtils.call_with_retry(request.next_chunk, idempotent=True)
+                if status:
+                    print(f"Uploaded {status.resumable_progress} bytes of '{name}'")
+            
+            return file
+        finally:
+            if spool is not None:
+                spool.close()
 
     @staticmethod
-    def download_file(file_id: str, credentials: service_account.Credentials) -> tuple[bytes, dict]:
+    def upload_from_url(name: str, parent_id: str, mime_type: str, file_url: str,
+                        credentials: service_account.Credentials, dedupe: bool = False) -> dict:
         """
-        Downloads a file from Google Drive.
-        For regular files, downloads the binary content directly.
-        For Google Workspace documents (Docs, Sheets, Slides), exports as PDF.
+        Stream a Dify file URL into a new Google Drive file
         
         Args:
-            file_id: ID of the file to download
+            name: Name of the file to create
+            parent_id: ID of the parent folder (use "root" for Drive root)
+            mime_type: MIME type of the file
+            file_url: URL of the file as given by Dify
             credentials: Google service account credentials
+            dedupe: Reuse an identical file with the same name in the folder
             
         Returns:
-            tuple: (file_content_bytes, metadata_dict)
+            Dictionary with file details including id, name, webViewLink, size
         """
+        with open_dify_file(file_url) as response:
+            content_length = response.headers.get("Content-Length")
+            file_size = int(content_length) if content_length else None
+            return GoogleDriveUtils.upload_file_stream(
+                name, parent_id, mime_type, response.raw, file_size, credentials, dedupe=dedupe
+            )
+
+    @staticmethod
+    def bulk_upload_from_urls(files: List[tuple[str, str, str]], parent_id: str,
+                              credentials: service_account.Credentials,
+                              max_workers: Optional[int] = None,
+                              dedupe: bool = False) -> tuple[List[Dict], dict]:
+        """
+        Upload several Dify files into the same folder with bounded concurrency
         
-        try:
-            # Create drive api client
-            service = GoogleDriveUtils.get_drive_service(credentials)
-            files = service.files()
-            
-            # Get file metadata first to determine file type
-            file_info = files.get(fileId=file_id).execute()
-            original_name = file_info.get("name", "unknown")
-            original_mime_type = file_info.get("mimeType", "unknown")
-            
-            # Check if it's a Google Workspace document that needs to be exported
-            google_workspace_mimes = {
-                "application/vnd.google-apps.document",     # Google Docs
-                "application/vnd.google-apps.spreadsheet",  # Google Sheets
-                "application/vnd.google-apps.presentation", # Google Slides
-                "application/vnd.google-apps.drawing",      # Google Drawings
-                "application/vnd.google-apps.script",       # Google Apps Script
-                "application/vnd.google-apps.form"          # Google Forms
+        Args:
+            files: List of (name, mime_type, file_url) tuples
+            parent_id: ID of the target folder, resolved once for the whole batch
+            credentials: Google service account credentials
+            max_workers: Number of concurrent uploads (default: BULK_UPLOAD_WORKERS,
+                at most BULK_UPLOAD_MAX_WORKERS)
+            dedupe: Reuse identical files with the same name in the folder
+            
+        Returns:
+            tuple: (per_file_results, stats_dict) where results keep the input order and
+            stats_dict has uploaded, deduplicated, failed, total_bytes, elapsed_seconds and
+            throughput_bytes_per_second. Deduplicated files count as uploaded but not
+            towards total_bytes.
+        """
+        max_workers = min(max_workers or GoogleDriveUtils.BULK_UPLOAD_WORKERS,
+                          GoogleDriveUtils.BULK_UPLOAD_MAX_WORKERS)
+        
+        def upload(item: tuple[str, str, str]) -> Dict:
+            name, mime_type, file_url = item
+            try:
+                file = GoogleDriveUtils.upload_from_url(
+                    name, parent_id, mime_type, file_url, credentials, dedupe
+                )
+            except Exception as e:
+                print(f"Error uploading file '{name}': {str(e)}")
+                return {"name": name, "success": False, "error": str(e)}
+            return {
+                "name": file.get("name", name),
+                "id": file.get("id"),
+                "mime_type": file.get("mimeType", mime_type),
+                "size": int(file.get("size", 0)),
+                "success": True,
+                "deduplicated": file.get("deduplicated", False),
+                "web_view_link": file.get("webViewLink", "")
             }
+        
+        started = time.monotonic()
+        with ThreadPoolExecutor(max_workers=max_workers) as pool:
+            results = list(pool.map(upload, files))
+        elapsed = time.monotonic() - started
+        
+        total_bytes = sum(result.get("size", 0) for result in results if not result.get("deduplicated"))
+        uploaded = sum(1 for result in results if result["success"])
+        stats = {
+            "uploaded": uploaded,
+            "deduplicated": sum(1 for result in results if result.get("deduplicated")),
+            "failed": len(results) - uploaded,
+            "total_bytes": total_bytes,
+            "elapsed_seconds": round(elapsed, 3),
+            "throughput_bytes_per_second": round(total_bytes / elapsed) if elapsed > 0 else total_bytes
+        }
+        return results, stats
+
+    @staticmethod
+    def _build_search_query(query: str, parent_id: Optional[str] = None, file_type: Optional[str] = None) -> str:
+        # Build query
+        search_query = f"name contains '{escape_query_value(query)}' and trashed=false"
+        
+        # Add file type filter if specified
+        if file_type and file_type.lower() in FILE_TYPE_MIME_TYPES:
+            search_query += f" and mimeType='{FILE_TYPE_MIME_TYPES[file_type.lower()]}'"
+        
+        # Add parent folder filter if specified
+        if parent_id:
+            search_query += f" and '{parent_id}' in parents"
+        
+        return search_query
+
+    @staticmethod
+    def iter_search_files(query: str, max_results: int, credentials: service_account.Credentials,
+                          parent_id: Optional[str] = None,
+                          file_type: Optional[str] = None) -> Generator[List[Dict], None, None]:
+        """
+        Search for files in Google Drive, yielding results page by page
+        
+        Follows nextPageToken until max_results files were returned. The next page
+        is fetched in the background while the caller consumes the current one.
+        
+        Args:
+            query: Search query string
+            max_results: Maximum number of results to return
+            credentials: Google service account credentials
+            parent_id: Optional parent folder ID to search within
+            file_type: Optional file type filter
             
-            if original_mime_type in google_workspace_mimes:
-                # Export Google Workspace document as PDF
-                print(f"Exporting Google Workspace file '{original_name}' as PDF")
-                request = files.export_media(fileId=file_id, mimeType='application/pdf')
+        Yields:
+            Lists of dictionaries with file details, one list per page
+        """
+        search_query = GoogleDriveUtils._build_search_query(query, parent_id, file_type)
+        print(f"Search query: {search_query}")
+        
+        for files in GoogleDriveUtils.iter_query_pages(search_query, max_results, credentials):
+            # Process results
+            results = []
+            for file in files:
+                file_parent_id = file.get('parents', ['root'])[0] if 'parents' in file else 'root'
+                results.append({
+                    'id': file.get('id'),
+                    'name': file.get('name'),
+                    'mime_type': file.get('mimeType'),
+                    'parent_id': file_parent_id
+                })
+            yield results
+
+    @staticmethod
+    def iter_query_pages(search_query: str, max_results: int, credentials: service_account.Credentials,
+                         fields: str = 'id, name, mimeType, parents') -> Generator[List[Dict], None, None]:
+        """
+        Run a files.list query and yield the raw Drive file resources page by page
+        
+        Follows nextPageToken until max_results files were returned. The next page
+        is fetched in the background while the caller consumes the current one.
+        
+        Args:
+            search_query: Drive query string (the q parameter)
+            max_results: Maximum number of results to return
+            credentials: Google service account credentials
+            fields: Fields to request for each file
+            
+        Yields:
+            Non-empty lists of Drive file resources, one list per page
+        """
+        service = GoogleDriveUtils.get_drive_service(credentials)
+        
+        def fetch_page(page_token: Optional[str], page_size: int) -> dict:
+            return GoogleDriveUtils.execute(service.files().list(
+                q=search_query,
+                spaces='drive',
+                fields=f'nextPageToken, files({fields})',
+                pageSize=page_size,
+                pageToken=page_token
+            ))
+        
+        remaining = max_results
+        with ThreadPoolExecutor(max_workers=1) as prefetcher:
+            future = prefetcher.submit(fetch_page, None, min(remaining, GoogleDriveUtils.SEARCH_PAGE_SIZE))
+            while future is not None:
+                response = future.result()
+                files = response.get('files', [])[:remaining]
+                remaining -= len(files)
                 
-                # Adjust metadata for exported file
-                # Remove original extension and add .pdf
-                name_without_ext = original_name.rsplit('.', 1)[0] if '.' in original_name else original_name
-                metadata = {
-                    "file_name": f"{name_without_ext}.pdf",
-                    "mime_type": "application/pdf",
-                    "original_name": original_name,
-                    "original_mime_type": original_mime_type,
-                    "exported": True
-                }
-            else:
-                # Download regular binary file
-                print(f"Downloading binary file '{original_name}'")
-                request = files.get_media(fileId=file_id)
-                metadata = {
-                    "file_name": original_name,
-                    "mime_type": original_mime_type,
-                }
-            
-            # Download the file content
-            file_bytes = io.BytesIO()
-            downloader = MediaIoBaseDownload(file_bytes, request)
-            done = False
-            while done is False:
-                _, done = downloader.next_chunk()
+                # Request the next page before handing this one to the caller
+                next_page_token = response.get('nextPageToken')
+                future = None
+                if next_page_token and remaining > 0:
+                    future = prefetcher.submit(
+                        fetch_page, next_page_token, min(remaining, GoogleDriveUtils.SEARCH_PAGE_SIZE)
+                    )
                 
-            return file_bytes.getvalue(), metadata
+                if files:
+                    yield files
+
+    @staticmethod
+    def resolve_export_format(mime_type: str, export_format: str) -> str:
+        """
+        Resolve the export format of a Google Workspace file, replacing "auto" with the
+        cheapest text form of its type
+        
+        Raises:
+            ValueError: If the type cannot be exported in the requested format
+        """
+        supported = WORKSPACE_EXPORT_FORMATS[mime_type]
+        if export_format == "auto":
+            return supported[0]
+        if export_format not in supported:
+            raise ValueError(
+                f"Cannot export {mime_type} as '{export_format}', supported formats: {', '.join(supported)}"
+            )
+        return export_format
+
+    @staticmethod
+    def _prepare_download(files: Any, file_id: str, file_info: Optional[dict] = None,
+                          export_format: str = "pdf") -> tuple[Any, dict, dict]:
+        """
+        Build the media request and result metadata for downloading a file.
+        Google Workspace documents are exported in export_format (PDF by default),
+        other files are downloaded as is.
+        Also returns the raw Drive metadata of the file, which is fetched unless given.
+        """
+        # Get file metadata first to determine file type
+        if file_info is None:
+            file_info = GoogleDriveUtils.execute(files.get(fileId=file_id, fields=DOWNLOAD_FIELDS))
+        original_name = file_info.get("name", "unknown")
+        original_mime_type = file_info.get("mimeType", "unknown")
+        
+        if original_mime_type in WORKSPACE_EXPORT_FORMATS:
+            # Export Google Workspace document in the requested format
+            export_format = GoogleDriveUtils.resolve_export_format(original_mime_type, export_format)
+            export_mime_type, extension = EXPORT_FORMATS[export_format]
+            print(f"Exporting Google Workspace file '{original_name}' as {export_format}")
+            request = files.export_media(fileId=file_id, mimeType=export_mime_type)
+            
+            # Adjust metadata for exported file
+            # Remove original extension and add the export extension
+            name_without_ext = original_name.rsplit('.', 1)[0] if '.' in original_name else original_name
+            metadata = {
+                "file_name": f"{name_without_ext}.{extension}",
+                "mime_type": export_mime_type,
+                "original_name": original_name,
+                "original_mime_type": original_mime_type,
+                "exported": True,
+                "export_format": export_format
+            }
+        else:
+            # Download regular binary file
+            print(f"Downloading binary file '{original_name}'")
+            request = files.get_media(fileId=file_id)
+            metadata = {
+                "file_name": original_name,
+                "mime_type": original_mime_type,
+            }
+        
+        return request, metadata, file_info
+
+    @staticmethod
+    def _download_cache_key(file_id: str, file_info: dict, metadata: dict) -> Optional[tuple]:
+        """
+        Key of a download in the download cache: the file, its revision and the MIME type
+        of the content. Workspace documents have no revision ID or checksum and fall back
+        to modifiedTime.
+        """
+        revision = file_info.get("headRevisionId") or file_info.get("md5Checksum") or file_info.get("modifiedTime")
+        if not revision:
+            return None
+        return (file_id, revision, metadata["mime_type"])
+
+    @staticmethod
+    def _open_cached_download(cache_key: Optional[tuple]) -> Optional[BinaryIO]:
+        if cache_key is None:
+            return None
+        try:
+            cached = GoogleDriveUtils._download_cache.open(cache_key)
+        except OSError as e:
+            print(f"Download cache unavailable: {e}")
+            return None
+        if cached is not None:
+            print(f"Serving file {cache_key[0]} from the download cache")
+        return cached
+
+    @staticmethod
+    def _cache_download(cache_key: Optional[tuple], fileobj: BinaryIO, size: int) -> None:
+        if cache_key is None:
+            return
+        try:
+            GoogleDriveUtils._download_cache.put(cache_key, fileobj, size)
+        except OSError as e:
+            print(f"Could not cache download of file {cache_key[0]}: {e}")
+
+    @staticmethod
+    def _handle_download_error(error: HttpError) -> None:
+        print(f"An error occurred: {error}")
+        # Handle specific error cases
+        if error.resp.status == 403:
+            print("Access denied - check file permissions")
+        elif error.resp.status == 404:
+            print("File not found")
+        elif error.resp.status == 400:
+            print("Bad request - possibly unsupported export format")
+
+    @staticmethod
+    def download_file_spooled(file_id: str, credentials: service_account.Credentials,
+                              max_memory: Optional[int] = None, file_info: Optional[dict] = None,
+                              export_format: str = "pdf",
+                              low_memory: bool = False) -> tuple[Optional[BinaryIO], dict]:
+        """
+        Downloads a file from Google Drive into a spooled temporary file.
+        The content stays in memory up to max_memory bytes and spills to disk beyond that,
+        so large files can be downloaded without holding them as one bytes object.
+        Unchanged file revisions are served from the download cache without any content transfer.
+        
+        Args:
+            file_id: ID of the file to download
+            credentials: Google service account credentials
+            max_memory: In-memory threshold in bytes (default: SPOOL_MAX_MEMORY)
+            file_info: Drive metadata with the DOWNLOAD_FIELDS of the file, if already known
+            export_format: Export format of Google Workspace documents, a key of
+                EXPORT_FORMATS or "auto" for the cheapest text form
+            low_memory: Write the content straight to disk and download large files
+                sequentially instead of as concurrent byte ranges
+            
+        Returns:
+            tuple: (file_object_positioned_at_start, metadata_dict), the caller closes the file.
+            metadata_dict includes "file_size".
+        """
+        spool = None
+        try:
+            service = GoogleDriveUtils.get_drive_service(credentials)
+            request, metadata, file_info = GoogleDriveUtils._prepare_download(
+                service.files(), file_id, file_info, export_format
+            )
+            
+            cache_key = GoogleDriveUtils._download_cache_key(file_id, file_info, metadata)
+            cached = GoogleDriveUtils._open_cached_download(cache_key)
+            if cached is not None:
+                metadata["file_size"] = os.fstat(cached.fileno()).st_size
+                return cached, metadata
+            
+            if low_memory:
+                # A SpooledTemporaryFile with max_size=0 would never roll over to disk
+                spool = tempfile.TemporaryFile()
+            else:
+                spool = tempfile.SpooledTemporaryFile(max_size=max_memory or GoogleDriveUtils.SPOOL_MAX_MEMORY)
+            size = int(file_info.get("size", 0))
+            if not low_memory and not metadata.get("exported") and size >= GoogleDriveUtils.PARALLEL_DOWNLOAD_THRESHOLD:
+                # Large binary files are fetched as concurrent byte ranges
+                GoogleDriveUtils.download_file_ranged(
+                    file_id, credentials, spool, size, file_info.get("md5Checksum")
+                )
+            else:
+                downloader = MediaIoBaseDownload(spool, request, chunksize=GoogleDriveUtils.DOWNLOAD_CHUNK_SIZE)
+                done = False
+                while done is False:
+                    _, done = GoogleDriveUtils.call_with_retry(downloader.next_chunk, idempotent=True)
+            
+            metadata["file_size"] = spool.tell()
+            spool.seek(0)
+            GoogleDriveUtils._cache_download(cache_key, spool, metadata["file_size"])
+            spool.seek(0)
+            return spool, metadata
             
         except HttpError as error:
-            print(f"An error occurred: {error}")
-            # Handle specific error cases
-            if error.resp.status == 403:
-                print("Access denied - check file permissions")
-            elif error.resp.status == 404:
-                print("File not found")
-            elif error.resp.status == 400:
-                print("Bad request - possibly unsupported export format")
+            if spool is not None:
+                spool.close()
+            GoogleDriveUtils._handle_download_error(error)
             return None, {}
+        except Exception:
+            if spool is not None:
+                spool.close()
+            raise
+
+    @staticmethod
+    def download_file_ranged(file_id: str, credentials: service_account.Credentials, dest: BinaryIO,
+                             size: int, md5_checksum: Optional[str] = None,
+                             part_size: Optional[int] = None, max_workers: Optional[int] = None) -> int:
+        """
+        Download a binary file as byte ranges fetched concurrently on a bounded thread pool.
+        Parts are written to dest in order, so at most max_workers + 1 parts are held in memory.
+        
+        Args:
+            file_id: ID of the file to download
+            credentials: Google service account credentials
+            dest: Writable binary file object the content is appended to
+            size: Size of the file in bytes
+            md5_checksum: Expected MD5 checksum of the content, verified when given
+            part_size: Size of each byte range (default: PARALLEL_DOWNLOAD_PART_SIZE)
+            max_workers: Number of concurrent range requests (default: PARALLEL_DOWNLOAD_WORKERS)
+            
+        Returns:
+            Number of bytes written
+            
+        Raises:
+            ValueError: If a part is truncated or the MD5 checksum does not match
+        """
+        part_size = part_size or GoogleDriveUtils.PARALLEL_DOWNLOAD_PART_SIZE
+        max_workers = max_workers or GoogleDriveUtils.PARALLEL_DOWNLOAD_WORKERS
+        service = GoogleDriveUtils.get_drive_service(credentials)
+        
+        def fetch_part(start: int) -> bytes:
+            end = min(start + part_size, size) - 1
+            request = service.files().get_media(fileId=file_id)
+            request.headers['Range'] = f"bytes={start}-{end}"
+            data = GoogleDriveUtils.execute(request)
+            if len(data) != end - start + 1:
+                raise ValueError(f"Truncated range {start}-{end} for file {file_id}: got {len(data)} bytes")
+            return data
+        
+        md5 = hashlib.md5()
+        offsets = iter(range(0, size, part_size))
+        written = 0
+        with ThreadPoolExecutor(max_workers=max_workers) as pool:
+            pending = deque(pool.submit(fetch_part, start) for start in itertools.islice(offsets, max_workers + 1))
+            try:
+                while pending:
+                    data = pending.popleft().result()
+                    dest.write(data)
+                    md5.update(data)
+                    written += len(data)
+                    next_start = next(offsets, None)
+                    if next_start is not None:
+                        pending.append(pool.submit(fetch_part, next_start))
+            finally:
+                for future in pending:
+                    future.cancel()
+        
+        if md5_checksum and md5.hexdigest() != md5_checksum:
+            raise ValueError(f"MD5 checksum mismatch for file {file_id}")
+        
+        print(f"Downloaded {written} bytes of file {file_id} in {part_size} byte ranges")
+        return written
+
+    @staticmethod
+    def get_thumbnail(file_id: str, credentials: service_account.Credentials,
+                      size: Optional[int] = None) -> tuple[bytes, dict]:
+        """
+        Fetch the thumbnail Drive renders for a file instead of its content
+        
+        The thumbnailLink of the file is requested at the given size with an authorized
+        request, so a preview of an image, PDF or Google Workspace document costs a few
+        kilobytes. Thumbnails are kept in the download cache keyed by file revision and size.
+        
+        Args:
+            file_id: ID of the file
+            credentials: Google service account credentials
+            size: Length in pixels of the longest edge (default: THUMBNAIL_SIZE)
+            
+        Returns:
+            tuple: (image_bytes, metadata_dict) with file_name, mime_type, file_size,
+            original_name, original_mime_type, thumbnail_size and cached
+            
+        Raises:
+            ValueError: If Drive has no thumbnail for the file
+        """
+        size = max(1, min(size or GoogleDriveUtils.THUMBNAIL_SIZE, GoogleDriveUtils.THUMBNAIL_MAX_SIZE))
+        service = GoogleDriveUtils.get_drive_service(credentials)
+        file_info = GoogleDriveUtils.execute(service.files().get(
+            fileId=file_id,
+            fields='id, name, mimeType, thumbnailLink, thumbnailVersion, headRevisionId, md5Checksum, modifiedTime'
+        ))
+        thumbnail_link = file_info.get("thumbnailLink")
+        if not thumbnail_link:
+            raise ValueError(f"No thumbnail available for file '{file_info.get('name')}'")
+        
+        # Links end in a size suffix like "=s220" that selects the rendered size
+        base, separator, suffix = thumbnail_link.rpartition("=s")
+        if separator and suffix.isdigit():
+            thumbnail_link = base
+        thumbnail_link = f"{thumbnail_link}=s{size}"
+        
+        metadata = {
+            "original_name": file_info.get("name"),
+            "original_mime_type": file_info.get("mimeType"),
+            "thumbnail_size": size
+        }
+        revision = (file_info.get("thumbnailVersion") or file_info.get("headRevisionId")
+                    or file_info.get("md5Checksum") or file_info.get("modifiedTime"))
+        cache_key = (file_id, revision, "thumbnail", size) if revision else None
+        
+        content = None
+        mime_type = None
+        cached = GoogleDriveUtils._open_cached_download(cache_key)
+        if cached is not None:
+            with cached:
+                content = cached.read()
+            # The image type is recognized from its signature since the cache stores only the bytes
+            mime_type = "image/png" if content.startswith(b"\x89PNG") else "image/jpeg"
+        
+        if content is None:
+            http = GoogleDriveUtils._get_http(credentials)
+            
+            def fetch() -> tuple[Any, bytes]:
+                resp, body = http.request(thumbnail_link, "GET")
+                if resp.status >= 400:
+                    raise HttpError(resp, body, uri=thumbnail_link)
+                return resp, body
+            
+            resp, content = GoogleDriveUtils.call_with_retry(fetch, idempotent=True)
+            mime_type = resp.get("content-type", "image/png").split(";")[0]
+            GoogleDriveUtils._cache_download(cache_key, io.BytesIO(content), len(content))
+        
+        extension = "png" if mime_type == "image/png" else "jpg"
+        stem = (file_info.get("name") or file_id).rsplit(".", 1)[0]
+        metadata.update({
+            "file_name": f"{stem}_thumbnail.{extension}",
+            "mime_type": mime_type,
+            "file_size": len(content),
+            "cached": cached is not None
+        })
+        return content, metadata
+    
+    @staticmethod
+    def execute_batch(service: Any, requests: List[tuple[str, HttpRequest]]) -> List[Dict]:
+        """
+        Execute requests through the Drive batch endpoint, up to BATCH_MAX_SIZE per round trip
+        
+        Args:
+            service: Google Drive service object
+            requests: List of (item_id, request) tuples
+            
+        Returns:
+            List of per-item result dictionaries in request order, each with
+            id, success and either result or error
+        """
+        results: List[Dict] = [{} for _ in requests]
+        rate_limited = set()
+        
+        def callback(request_id, response, exception):
+            index = int(request_id)
+            item_id = requests[index][0]
+            if exception is not None:
+                results[index] = {"id": item_id, "success": False, "error": str(exception)}
+                if classify_retryable_error(exception) == "rate_limit":
+                    rate_limited.add(index)
+            else:
+                results[index] = {"id": item_id, "success": True, "result": response}
+        
+        for offset in range(0, len(requests), GoogleDriveUtils.BATCH_MAX_SIZE):
+            pending = list(range(offset, min(offset + GoogleDriveUtils.BATCH_MAX_SIZE, len(requests))))
+            attempt = 0
+            while pending:
+                batch = service.new_batch_http_request(callback=callback)
+                for index in pending:
+                    batch.add(requests[index][1], request_id=str(index))
+                # Drive counts every sub-request against the quota
+                limiter = getattr(requests[pending[0]][1].http, "limiter", None)
+                if limiter is not None:
+                    limiter.acquire([(requests[index][1].method, requests[index][1].uri) for index in pending])
+                print(f"Executing batch of {len(pending)} Drive requests")
+                rate_limited.clear()
+                GoogleDriveUtils.execute(batch, idempotent=False)
+                
+                # Rate-limited sub-requests were not processed and are sent again in a new batch
+                pending = sorted(rate_limited)
+                if pending and attempt >= GoogleDriveUtils.RETRY_MAX_ATTEMPTS:
+                    GoogleDriveUtils._retry_stats.increment("give_ups")
+                    break
+                if pending:
+                    delay = GoogleDriveUtils._retry_delay(attempt)
+                    attempt += 1
+                    GoogleDriveUtils._retry_stats.increment("retries")
+                    GoogleDriveUtils._retry_stats.increment("retries_rate_limit")
+                    print(f"Retrying {len(pending)} rate-limited batch requests in {delay:.1f}s")
+                    time.sleep(delay)
+        
+        return results
+
+    @staticmethod
+    def batch_get_metadata(file_ids: List[str], credentials: service_account.Credentials) -> List[Dict]:
+        """
+        Fetch metadata of several files in batched round trips
+        
+        Args:
+            file_ids: IDs of the files
+            credentials: Google service account credentials
+            
+        Returns:
+            Per-file result dictionaries
+        """
+        service = GoogleDriveUtils.get_drive_service(credentials)
+        fields = 'id, name, mimeType, parents, size, modifiedTime, webViewLink, trashed'
+        return GoogleDriveUtils.execute_batch(service, [
+            (file_id, service.files().get(fileId=file_id, fields=fields)) for file_id in file_ids
+        ])
+
+    @staticmethod
+    def batch_create_folders(names: List[str], parent_id: str,
+                             credentials: service_account.Credentials) -> List[Dict]:
+        """
+        Create several folders under the same parent in batched round trips
+        
+        Args:
+            names: Names of the folders to create
+            parent_id: ID of the parent folder (use "root" for Drive root)
+            credentials: Google service account credentials
+            
+        Returns:
+            Per-folder result dictionaries, keyed by folder name
+        """
+        service = GoogleDriveUtils.get_drive_service(credentials)
+        parents = [parent_id] if parent_id and parent_id != "root" else ["root"]
+        return GoogleDriveUtils.execute_batch(service, [
+            (name, service.files().create(
+                body={'name': name, 'mimeType': 'application/vnd.google-apps.folder', 'parents': parents},
+                fields='id, name, webViewLink, parents'
+            )) for name in names
+        ])
+
+    @staticmethod
+    def batch_rename(file_ids: List[str], new_names: List[str],
+                     credentials: service_account.Credentials) -> List[Dict]:
+        """
+        Rename several files in batched round trips
+        
+        Args:
+            file_ids: IDs of the files to rename
+            new_names: New names, one per file ID
+            credentials: Google service account credentials
+            
+        Returns:
+            Per-file result dictionaries
+        """
+        if len(file_ids) != len(new_names):
+            raise ValueError("The number of names must match the number of file IDs")
+        service = GoogleDriveUtils.get_drive_service(credentials)
+        return GoogleDriveUtils.execute_batch(service, [
+            (file_id, service.files().update(fileId=file_id, body={'name': name}, fields='id, name'))
+            for file_id, name in zip(file_ids, new_names)
+        ])
+
+    @staticmethod
+    def batch_move(file_ids: List[str], target_folder_id: str,
+                   credentials: service_account.Credentials) -> List[Dict]:
+        """
+        Move several files into a folder in batched round trips.
+        Current parents are looked up in one batch and replaced in a second one.
+        
+        Args:
+            file_ids: IDs of the files to move
+            target_folder_id: ID of the destination folder
+            credentials: Google service account credentials
+            
+        Returns:
+            Per-file result dictionaries
+        """
+        service = GoogleDriveUtils.get_drive_service(credentials)
+        lookups = GoogleDriveUtils.execute_batch(service, [
+            (file_id, service.files().get(fileId=file_id, fields='id, parents')) for file_id in file_ids
+        ])
+        
+        moves = []
+        for lookup in lookups:
+            if lookup["success"]:
+                previous_parents = ",".join(lookup["result"].get("parents", []))
+                moves.append((lookup["id"], service.files().update(
+                    fileId=lookup["id"],
+                    addParents=target_folder_id,
+                    removeParents=previous_parents,
+                    fields='id, name, parents'
+                )))
+        moved = {item["id"]: item for item in GoogleDriveUtils.execute_batch(service, moves)}
+        
+        return [moved.get(lookup["id"], lookup) for lookup in lookups]
+
+    @staticmethod
+    def batch_trash(file_ids: List[str], credentials: service_account.Credentials) -> List[Dict]:
+        """
+        Move several files to the trash in batched round trips
+        
+        Args:
+            file_ids: IDs of the files to trash
+            credentials: Google service account credentials
+            
+        Returns:
+            Per-file result dictionaries
+        """
+        service = GoogleDriveUtils.get_drive_service(credentials)
+        return GoogleDriveUtils.execute_batch(service, [
+            (file_id, service.files().update(fileId=file_id, body={'trashed': True}, fields='id, name, trashed'))
+            for file_id in file_ids
+        ])
+
+    @staticmethod
+    def batch_share(file_ids: List[str], email: str, role: str,
+                    credentials: service_account.Credentials) -> List[Dict]:
+        """
+        Grant a user a permission on several files in batched round trips
+        
+        Args:
+            file_ids: IDs of the files to share
+            email: Email address of the user to share with
+            role: Permission role (reader, commenter, writer)
+            credentials: Google service account credentials
+            
+        Returns:
+            Per-file result dictionaries
+        """
+        service = GoogleDriveUtils.get_drive_service(credentials)
+        permission = {'type': 'user', 'role': role, 'emailAddress': email}
+        return GoogleDriveUtils.execute_batch(service, [
+            (file_id, service.permissions().create(
+                fileId=file_id, body=permission, sendNotificationEmail=False, fields='id, role'
+            )) for file_id in file_ids
+        ])
+
+    @staticmethod
+    def iter_folder_levels(folder_id: str, credentials: service_account.Credentials,
+                           fields: str = 'id, name, mimeType, parents', max_depth: Optional[int] = None,
+                           folders_only: bool = False,
+                           max_workers: Optional[int] = None) -> Generator[List[tuple[str, Dict]], None, None]:
+        """
+        List the contents of a folder tree breadth first, one level at a time
+        
+        The folders of each level are grouped into combined "'a' in parents or 'b' in parents"
+        queries of up to TREE_PARENTS_PER_QUERY folders, which run concurrently and are each
+        paginated, so a level costs a handful of calls instead of one call per folder.
+        
+        Args:
+            folder_id: ID of the folder to walk
+            credentials: Google service account credentials
+            fields: Fields to request for each file, id, mimeType and parents are always included
+            max_depth: Number of levels to list, 1 lists only the direct children (default: unlimited)
+            folders_only: List only subfolders
+            max_workers: Number of concurrent queries (default: TREE_LIST_WORKERS)
+            
+        Yields:
+            Lists of (parent_folder_id, drive_file_resource), one list per level. A file with
+            several parents in the tree is listed once per parent.
+        """
+        max_workers = max_workers or GoogleDriveUtils.TREE_LIST_WORKERS
+        requested = [field.strip() for field in fields.split(",")]
+        fields = ", ".join(dict.fromkeys(["id", "mimeType", "parents", *requested]))
+        folder_filter = " and mimeType = 'application/vnd.google-apps.folder'" if folders_only else ""
+        
+        def list_children(parent_ids: List[str]) -> List[Dict]:
+            parents = " or ".join(f"'{parent_id}' in parents" for parent_id in parent_ids)
+            query = f"({parents}) and trashed = false{folder_filter}"
+            children = []
+            for files in GoogleDriveUtils.iter_query_pages(query, sys.maxsize, credentials, fields):
+                children.extend(files)
+            return children
+        
+        visited = {folder_id}
+        level = [folder_id]
+        depth = 0
+        with ThreadPoolExecutor(max_workers=max_workers) as pool:
+            while level and (max_depth is None or depth < max_depth):
+                depth += 1
+                level_ids = set(level)
+                size = GoogleDriveUtils.TREE_PARENTS_PER_QUERY
+                futures = [pool.submit(list_children, level[i:i + size]) for i in range(0, len(level), size)]
+                
+                entries = []
+                next_level = []
+                for future in as_completed(futures):
+                    for file in future.result():
+                        for parent_id in file.get("parents", []):
+                            if parent_id in level_ids:
+                                entries.append((parent_id, file))
+                        # Folders with several parents are only expanded once
+                        if file.get("mimeType") == "application/vnd.google-apps.folder" and file["id"] not in visited:
+                            visited.add(file["id"])
+                            next_level.append(file["id"])
+                level = next_level
+                yield entries
+    
+    @staticmethod
+    def list_folder_tree(folder_id: str, credentials: service_account.Credentials,
+                         max_depth: Optional[int] = None, max_items: Optional[int] = None,
+                         folders_only: bool = False, max_workers: Optional[int] = None) -> dict:
+        """
+        List a folder tree as a nested dictionary
+        
+        Args:
+            folder_id: ID of the root folder
+            credentials: Google service account credentials
+            max_depth: Number of levels to list (default: unlimited)
+            max_items: Maximum number of files and folders to include (default: unlimited)
+            folders_only: List only subfolders
+            max_workers: Number of concurrent queries (default: TREE_LIST_WORKERS)
+            
+        Returns:
+            dict: {"tree", "folder_count", "file_count", "depth", "truncated"}. Every node has
+            id, name and mime_type, folders whose contents were listed also have children.
+            A folder whose listing was cut by max_items has "truncated": True, and truncated
+            is set when max_items or max_depth left part of the tree unlisted.
+        """
+        service = GoogleDriveUtils.get_drive_service(credentials)
+        root = GoogleDriveUtils.execute(service.files().get(fileId=folder_id, fields='id, name, mimeType'))
+        tree = {"id": root["id"], "name": root.get("name"), "mime_type": root.get("mimeType")}
+        nodes = {root["id"]: tree}
+        
+        folder_count = 0
+        file_count = 0
+        depth = 0
+        truncated = False
+        # Folders added on the last level, their contents arrive with the next one
+        frontier = [tree]
+        # Children report the real ID of the root folder as parent, never the "root" alias
+        levels = GoogleDriveUtils.iter_folder_levels(
+            root["id"], credentials, max_depth=max_depth, folders_only=folders_only, max_workers=max_workers
+        )
+        try:
+            for entries in levels:
+                # Group the level by parent, in the order the parents were added
+                children = {node["id"]: [] for node in frontier}
+                for parent_id, file in entries:
+                    children[parent_id].append(file)
+                listed = frontier
+                frontier = []
+                if entries:
+                    depth += 1
+                
+                for parent in listed:
+                    if max_items is not None and folder_count + file_count >= max_items:
+                        truncated = True
+                        break
+                    # A folder gets children only once its listing is processed
+                    parent["children"] = []
+                    files = sorted(children[parent["id"]], key=lambda file: (
+                        file.get("mimeType") != "application/vnd.google-apps.folder",
+                        (file.get("name") or "").lower()
+                    ))
+                    for file in files:
+                        if max_items is not None and folder_count + file_count >= max_items:
+                            parent["truncated"] = True
+                            truncated = True
+                            break
+                        node = {"id": file["id"], "name": file.get("name"), "mime_type": file.get("mimeType")}
+                        if file.get("mimeType") == "application/vnd.google-apps.folder":
+                            folder_count += 1
+                            if file["id"] not in nodes:
+                                nodes[file["id"]] = node
+                                frontier.append(node)
+                        else:
+                            file_count += 1
+                        parent["children"].append(node)
+                    if truncated:
+                        break
+                
+                # Do not request another level once the item budget is spent
+                if truncated or (max_items is not None and folder_count + file_count >= max_items and frontier):
+                    truncated = True
+                    break
+        finally:
+            levels.close()
+        
+        # Folders below the depth limit were never listed and have no children key
+        truncated = truncated or bool(frontier)
+        return {
+            "tree": tree,
+            "folder_count": folder_count,
+            "file_count": file_count,
+            "depth": depth,
+            "truncated": truncated
+        }
+    
+    @staticmethod
+    def get_folder_stats(folder_id: str, credentials: service_account.Credentials,
+                         use_cache: bool = True) -> dict:
+        """
+        Compute aggregate statistics of a folder subtree
+        
+        The subtree is listed once, level by level, requesting only size, mimeType,
+        modifiedTime and parents. Results are cached per folder and Drive changes token,
+        so they are reused until anything in Drive changes.
+        
+        Args:
+            folder_id: ID of the root folder
+            credentials: Google service account credentials
+            use_cache: Return cached statistics when Drive has not changed since they were computed
+            
+        Returns:
+            dict: folder_id, total_bytes, file_count, folder_count, unsized_file_count (Google
+            Workspace files, which have no size), mime_types histogram, newest_modified_time,
+            oldest_modified_time and cached
+        """
+        service = GoogleDriveUtils.get_drive_service(credentials)
+        folder = GoogleDriveUtils.execute(service.files().get(fileId=folder_id, fields='id'))
+        # Take the change token first so changes made during the listing invalidate the result
+        changes_token = GoogleDriveUtils.execute(service.changes().getStartPageToken())['startPageToken']
+        cache_key = (credentials_fingerprint(credentials), folder["id"], changes_token)
+        if use_cache:
+            cached = GoogleDriveUtils._folder_stats_cache.get(cache_key)
+            if cached is not None:
+                return {**cached, "cached": True}
+        
+        total_bytes = 0
+        file_count = 0
+        folder_count = 0
+        unsized_file_count = 0
+        mime_types = Counter()
+        newest = None
+        oldest = None
+        seen = set()
+        for entries in GoogleDriveUtils.iter_folder_levels(
+            folder["id"], credentials, 'size, mimeType, modifiedTime, parents'
+        ):
+            for _, file in entries:
+                # Files with several parents in the subtree are counted once
+                if file["id"] in seen:
+                    continue
+                seen.add(file["id"])
+                mime_type = file.get("mimeType")
+                if mime_type == "application/vnd.google-apps.folder":
+                    folder_count += 1
+                    continue
+                file_count += 1
+                mime_types[mime_type] += 1
+                if "size" in file:
+                    total_bytes += int(file["size"])
+                else:
+                    unsized_file_count += 1
+                modified_time = file.get("modifiedTime")
+                if modified_time:
+                    # RFC 3339 timestamps in UTC compare correctly as strings
+                    newest = modified_time if newest is None or modified_time > newest else newest
+                    oldest = modified_time if oldest is None or modified_time < oldest else oldest
+        
+        stats = {
+            "folder_id": folder["id"],
+            "total_bytes": total_bytes,
+            "file_count": file_count,
+            "folder_count": folder_count,
+            "unsized_file_count": unsized_file_count,
+            "mime_types": dict(mime_types.most_common()),
+            "newest_modified_time": newest,
+            "oldest_modified_time": oldest
+        }
+        GoogleDriveUtils._folder_stats_cache.put(cache_key, stats)
+        return {**stats, "cached": False}
+    
+    @staticmethod
+    def walk_folder(folder_id: str, credentials: service_account.Credentials,
+                    fields: str = DOWNLOAD_FIELDS) -> Generator[tuple[str, Dict], None, None]:
+        """
+        Recursively list the files below a folder
+        
+        Args:
+            folder_id: ID of the folder to walk
+            credentials: Google service account credentials
+            fields: Fields to request for each file, id, name and mimeType are always included
+            
+        Yields:
+            (relative_folder_path, drive_file_resource) for every non-folder file,
+            folder names are made safe to use as path segments
+        """
+        paths = {folder_id: ""}
+        for entries in GoogleDriveUtils.iter_folder_levels(folder_id, credentials, fields):
+            for parent_id, file in entries:
+                if file.get("mimeType") == "application/vnd.google-apps.folder":
+                    paths.setdefault(file["id"], f"{paths[parent_id]}{safe_path_segment(file['name'])}/")
+                else:
+                    yield paths[parent_id], file
+    
+    @staticmethod
+    def download_folder_zip(folder_id: str, credentials: service_account.Credentials,
+                            max_workers: Optional[int] = None,
+                            export_format: str = "pdf") -> tuple[BinaryIO, dict]:
+        """
+        Download every file below a folder into a ZIP archive on disk
+        
+        Files are downloaded or exported concurrently on a bounded thread pool straight
+        into temporary files on disk and streamed into the archive as they complete.
+        Memory use is bounded by one download chunk per worker; the files in flight are
+        bounded to FOLDER_ARCHIVE_MAX_PENDING_BYTES and 2 * max_workers files.
+        
+        Args:
+            folder_id: ID of the folder to archive
+            credentials: Google service account credentials
+            max_workers: Number of concurrent downloads (default: FOLDER_ARCHIVE_WORKERS,
+                at most FOLDER_ARCHIVE_MAX_WORKERS)
+            export_format: Export format of Google Workspace documents, "auto" exports each
+                type in its cheapest text form
+            
+        Returns:
+            tuple: (archive_file_positioned_at_start, summary_dict), the caller closes the file.
+            summary_dict has folder_name, file_count, archive_size and failed files.
+        """
+        max_workers = min(max_workers or GoogleDriveUtils.FOLDER_ARCHIVE_WORKERS,
+                          GoogleDriveUtils.FOLDER_ARCHIVE_MAX_WORKERS)
+        service = GoogleDriveUtils.get_drive_service(credentials)
+        folder = GoogleDriveUtils.execute(service.files().get(fileId=folder_id, fields='id, name'))
+        
+        def download(path: str, file: Dict) -> tuple[str, Dict, Optional[BinaryIO], dict]:
+            try:
+                spool, metadata = GoogleDriveUtils.download_file_spooled(
+                    file["id"], credentials, file_info=file, export_format=export_format, low_memory=True
+                )
+            except Exception as e:
+                return path, file, None, {"error": str(e)}
+            return path, file, spool, metadata
+        
+        def discard(futures) -> None:
+            # Wait for downloads that will not be archived and close their temporary files
+            for future in futures:
+                if future.cancel():
+                    continue
+                spool = future.result()[2]
+                if spool is not None:
+                    spool.close()
+        
+        archive = tempfile.TemporaryFile()
+        used_names = set()
+        file_count = 0
+        failed = []
+        
+        def write_result(future) -> None:
+            nonlocal file_count
+            path, file, spool, metadata = future.result()
+            if spool is None:
+                failed.append({
+                    "id": file["id"],
+                    "name": f"{path}{file.get('name')}",
+                    "error": metadata.get("error", "download failed")
+                })
+                return
+            
+            # Keep archive names unique when a folder has files with the same name
+            file_name = safe_path_segment(metadata['file_name'])
+            name = f"{path}{file_name}"
+            stem, dot, extension = name.rpartition(".") if "." in file_name else (name, "", "")
+            counter = 1
+            while name in used_names:
+                name = f"{stem} ({counter}){dot}{extension}"
+                counter += 1
+            used_names.add(name)
+            
+            with spool, zip_file.open(name, "w", force_zip64=True) as entry:
+                shutil.copyfileobj(spool, entry, GoogleDriveUtils.DOWNLOAD_CHUNK_SIZE)
+            file_count += 1
+        
+        # Pending futures and the expected size of their files, exports are
+        # assumed to take one download chunk
+        pending = {}
+        try:
+            with zipfile.ZipFile(archive, "w", compression=zipfile.ZIP_DEFLATED) as zip_file:
+                with ThreadPoolExecutor(max_workers=max_workers) as pool:
+                    try:
+                        for path, file in GoogleDriveUtils.walk_folder(folder["id"], credentials):
+                            size = int(file.get("size") or GoogleDriveUtils.DOWNLOAD_CHUNK_SIZE)
+                            while pending and (
+                                len(pending) >= max_workers * 2
+                                or sum(pending.values()) + size > GoogleDriveUtils.FOLDER_ARCHIVE_MAX_PENDING_BYTES
+                            ):
+                                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                                for future in done:
+                                    del pending[future]
+                                    write_result(future)
+                            pending[pool.submit(download, path, file)] = size
+                        for future in as_completed(list(pending)):
+                            del pending[future]
+                            write_result(future)
+                    finally:
+                        discard(pending)
+        except BaseException:
+            archive.close()
+            raise
+        
+        archive_size = archive.tell()
+        archive.seek(0)
+        print(f"Archived {file_count} files of folder '{folder.get('name')}' ({archive_size} bytes)")
+        return archive, {
+            "folder_name": folder.get("name", folder_id),
+            "file_count": file_count,
+            "archive_size": archive_size,
+            "failed": failed
+        }
@@ -0,0 +1,22 @@
+import os
+import sys
+
+import pytest
+
+# The plugin modules are imported from the plugin root, as the Dify runtime does
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from drive_utils import GoogleDriveUtils  # noqa: E402
+
+
+@pytest.fixture(autouse=True)
+def fresh_drive_utils(monkeypatch):
+    """
+    Start every test with empty process-wide caches and no retry backoff
+    """
+    monkeypatch.setattr(GoogleDriveUtils, "RETRY_BASE_DELAY", 0)
+    for cache in (GoogleDriveUtils._service_cache, GoogleDriveUtils._pooled_transports,
+                  GoogleDriveUtils._rate_limiters, GoogleDriveUtils._token_refreshers):
+        cache.clear()
+    GoogleDriveUtils._retry_stats.reset()
+    yield
@@ -0,0 +1,64 @@
+import httplib2
+import pytest
+from googleapiclient.discovery import build_from_document
+
+import drive_utils
+from drive_utils import GoogleDriveUtils
+
+
+class RecordingHttp:
+    """
+    httplib2-compatible transport answering every request with an empty file listing
+    """
+
+    def __init__(self):
+        self.uris = []
+
+    def request(self, uri, method="GET", body=None, headers=None, **kwargs):
+        self.uris.append(uri)
+        return httplib2.Response({"status": "200", "content-type": "application/json"}), b'{"files": []}'
+
+
+@pytest.fixture
+def http(monkeypatch):
+    http = RecordingHttp()
+    monkeypatch.setattr(drive_utils, "credentials_fingerprint", lambda credentials: "test")
+    monkeypatch.setattr(GoogleDriveUtils, "_get_http", staticmethod(lambda credentials: http))
+    return http
+
+
+def test_bundled_discovery_document_is_parsed_at_import():
+    assert drive_utils._DRIVE_DISCOVERY_DOCUMENT is not None
+    assert drive_utils._DRIVE_DISCOVERY_DOCUMENT["name"] == "drive"
+    assert drive_utils._DRIVE_DISCOVERY_DOCUMENT["version"] == "v3"
+
+
+def test_service_is_built_without_fetching_discovery(monkeypatch, http):
+    def fail_build(*args, **kwargs):
+        raise AssertionError("build() must not be used with the bundled discovery document")
+
+    monkeypatch.setattr(drive_utils, "build", fail_build)
+    service = GoogleDriveUtils.get_drive_service(object())
+    response = GoogleDriveUtils.execute(service.files().list(q="trashed = false"))
+
+    assert response == {"files": []}
+    assert len(http.uris) == 1
+    assert "/drive/v3/files" in http.uris[0]
+    assert GoogleDriveUtils.get_drive_service(object()) is service
+
+
+def test_discovery_build_is_used_when_bundled_document_is_disabled(monkeypatch, http):
+    calls = []
+
+    def recording_build(service_name, version, **kwargs):
+        calls.append((service_name, version, kwargs.get("cache_discovery")))
+        return build_from_document(drive_utils._DRIVE_DISCOVERY_DOCUMENT, http=kwargs["http"],
+                                   requestBuilder=kwargs["requestBuilder"])
+
+    monkeypatch.setattr(drive_utils, "build", recording_build)
+    monkeypatch.setattr(GoogleDriveUtils, "USE_BUNDLED_DISCOVERY", False)
+    service = GoogleDriveUtils.get_drive_service(object())
+    GoogleDriveUtils.execute(service.files().list(q="trashed = false"))
+
+    assert calls == [("drive", "v3", False)]
+    assert len(http.uris) == 1
@@ -0,0 +1,73 @@
+import gzip
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+from google.auth.credentials import AnonymousCredentials
+
+from drive_utils import DriveRateLimiter, PooledHttp
+
+
+class KeepAliveHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        self.server.connections.add(self.client_address)
+        body = b'{"files": []}'
+        self.send_response(200)
+        if self.path == "/gzip":
+            body = gzip.compress(body)
+            self.send_header("Content-Encoding", "gzip")
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def server():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), KeepAliveHandler)
+    server.connections = set()
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def make_http(pool_size: int) -> PooledHttp:
+    return PooledHttp(AnonymousCredentials(), DriveRateLimiter(0, 0, 0, 0), pool_size=pool_size, timeout=10)
+
+
+def test_concurrent_requests_reuse_pooled_connections(server):
+    http = make_http(pool_size=4)
+    http.session.mount("http://", http.session.get_adapter("https://"))
+    uri = f"http://127.0.0.1:{server.server_port}/files"
+
+    def fetch(_):
+        resp, content = http.request(uri)
+        return resp.status, content
+
+    with ThreadPoolExecutor(max_workers=4) as pool:
+        results = list(pool.map(fetch, range(200)))
+
+    assert all(result == (200, b'{"files": []}') for result in results)
+    # 200 requests share at most one warm connection per concurrent caller
+    assert len(server.connections) <= 4
+    print(f"200 requests over {len(server.connections)} connections")
+    http.close()
+
+
+def test_decoded_responses_do_not_announce_content_encoding(server):
+    http = make_http(pool_size=1)
+    resp, content = http.request(f"http://127.0.0.1:{server.server_port}/gzip")
+
+    assert content == b'{"files": []}'
+    assert "content-encoding" not in resp
+    assert resp["-content-encoding"] == "gzip"
+    assert resp["content-length"] == str(len(content))
+    http.close()
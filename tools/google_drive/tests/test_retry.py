@@ -0,0 +1,65 @@
+import json
+
+import httplib2
+from googleapiclient.errors import HttpError
+
+from drive_utils import classify_retryable_error, http_error_reasons
+
+
+def make_error(status: int, body: dict) -> HttpError:
+    return HttpError(httplib2.Response({"status": status}), json.dumps(body).encode("utf-8"))
+
+
+# Shape of the quota error Drive v3 returns today: ErrorInfo details and legacy errors side by side
+RATE_LIMITED_403 = {
+    "error": {
+        "code": 403,
+        "message": "Quota exceeded for quota metric 'Queries' and limit 'Queries per minute'.",
+        "errors": [{
+            "message": "Quota exceeded for quota metric 'Queries' and limit 'Queries per minute'.",
+            "domain": "usageLimits",
+            "reason": "rateLimitExceeded",
+        }],
+        "status": "PERMISSION_DENIED",
+        "details": [{
+            "@type": "type.googleapis.com/google.rpc.ErrorInfo",
+            "reason": "RATE_LIMIT_EXCEEDED",
+            "domain": "googleapis.com",
+            "metadata": {"service": "drive.googleapis.com"},
+        }],
+    }
+}
+
+FORBIDDEN_403 = {
+    "error": {
+        "code": 403,
+        "message": "The user does not have sufficient permissions for this file.",
+        "errors": [{
+            "message": "The user does not have sufficient permissions for this file.",
+            "domain": "global",
+            "reason": "insufficientFilePermissions",
+        }],
+    }
+}
+
+
+def test_two_part_quota_error_is_rate_limited():
+    error = make_error(403, RATE_LIMITED_403)
+
+    assert {"rateLimitExceeded", "RATE_LIMIT_EXCEEDED"} <= http_error_reasons(error)
+    assert classify_retryable_error(error) == "rate_limit"
+
+
+def test_error_info_only_quota_error_is_rate_limited():
+    body = {"error": {"code": 403, "message": "Quota exceeded", "details": [
+        {"@type": "type.googleapis.com/google.rpc.ErrorInfo", "reason": "USER_RATE_LIMIT_EXCEEDED"}]}}
+
+    assert classify_retryable_error(make_error(403, body)) == "rate_limit"
+
+
+def test_permission_error_is_not_retried():
+    assert classify_retryable_error(make_error(403, FORBIDDEN_403)) is None
+
+
+def test_server_errors_are_retried():
+    assert classify_retryable_error(make_error(503, {"error": {"code": 503, "message": "Backend Error"}})) == "server_error"
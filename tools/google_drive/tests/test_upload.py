@@ -0,0 +1,143 @@
+import hashlib
+import io
+import json
+import tracemalloc
+
+import httplib2
+import pytest
+from googleapiclient.discovery import build_from_document
+
+import drive_utils
+from drive_utils import GoogleDriveUtils
+
+CHUNK_SIZE = 256 * 1024
+# Repeating content of the synthetic stream, its length is not a divisor of the chunk size
+PATTERN = bytes(range(251)) * (2 * CHUNK_SIZE // 251 + 2)
+
+
+class SyntheticStream(io.RawIOBase):
+    """
+    Non-seekable stream of deterministic content generated on the fly
+    """
+
+    def __init__(self, size: int):
+        self.size = size
+        self.position = 0
+        self.md5 = hashlib.md5()
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        length = min(len(buffer), self.size - self.position, 2 * CHUNK_SIZE)
+        offset = self.position % 251
+        data = PATTERN[offset:offset + length]
+        buffer[:length] = data
+        self.md5.update(data)
+        self.position += length
+        return length
+
+
+class FakeResumableDrive:
+    """
+    httplib2-compatible stand-in for the resumable upload protocol of the Drive API.
+    Received content is only hashed, and chunk numbers in fail_chunks answer 503 once.
+    """
+
+    def __init__(self, fail_chunks=()):
+        self.fail_chunks = set(fail_chunks)
+        self.received = 0
+        self.md5 = hashlib.md5()
+        self.chunks = 0
+        self.max_body = 0
+
+    def request(self, uri, method="GET", body=None, headers=None, **kwargs):
+        headers = {key.lower(): value for key, value in (headers or {}).items()}
+        if "uploadType=resumable" in uri:
+            return httplib2.Response({"status": "200", "location": "https://upload.test/session?upload_id=1"}), b""
+
+        content_range = headers.get("content-range", "")
+        if content_range.startswith("bytes */"):
+            # Status query after a failed chunk
+            return self._progress(), b""
+
+        self.chunks += 1
+        if self.chunks in self.fail_chunks:
+            self.fail_chunks.discard(self.chunks)
+            return httplib2.Response({"status": "503"}), b'{"error": {"code": 503}}'
+
+        # Known-size uploads send buffers, uploads from a seekable spool send a file slice
+        data = body.read() if hasattr(body, "read") else bytes(body)
+        self.max_body = max(self.max_body, len(data))
+        start = int(content_range.split(" ")[1].split("-")[0])
+        assert start == self.received
+        self.md5.update(data)
+        self.received += len(data)
+        total = content_range.rsplit("/", 1)[1]
+        if total != "*" and self.received == int(total):
+            file = {"id": "uploaded", "name": "synthetic.bin", "size": str(self.received)}
+            return httplib2.Response({"status": "200"}), json.dumps(file).encode()
+        return self._progress(), b""
+
+    def _progress(self):
+        info = {"status": "308"}
+        if self.received:
+            info["range"] = f"bytes=0-{self.received - 1}"
+        return httplib2.Response(info)
+
+
+@pytest.fixture
+def drive(monkeypatch):
+    drive = FakeResumableDrive()
+    service = build_from_document(drive_utils._DRIVE_DISCOVERY_DOCUMENT, http=drive)
+    monkeypatch.setattr(GoogleDriveUtils, "get_drive_service", staticmethod(lambda credentials: service))
+    return drive
+
+
+def test_streaming_upload_keeps_memory_bounded(drive):
+    size = 32 * 1024 * 1024
+    stream = io.BufferedReader(SyntheticStream(size), CHUNK_SIZE)
+
+    tracemalloc.start()
+    try:
+        file = GoogleDriveUtils.upload_file_stream(
+            "synthetic.bin", "root", "application/octet-stream", stream, size, None, chunk_size=CHUNK_SIZE
+        )
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    assert file["id"] == "uploaded"
+    assert drive.received == size
+    assert drive.md5.hexdigest() == stream.raw.md5.hexdigest()
+    assert drive.max_body == CHUNK_SIZE
+    # A few chunks at most, independent of the 32 MB file size
+    assert peak < 8 * CHUNK_SIZE
+
+
+def test_upload_resumes_after_server_error(drive):
+    drive.fail_chunks = {3}
+    size = 5 * CHUNK_SIZE + 123
+    stream = SyntheticStream(size)
+
+    file = GoogleDriveUtils.upload_file_stream(
+        "synthetic.bin", "root", "application/octet-stream", stream, size, None, chunk_size=CHUNK_SIZE
+    )
+
+    assert file["id"] == "uploaded"
+    assert drive.received == size
+    assert drive.md5.hexdigest() == stream.md5.hexdigest()
+    assert GoogleDriveUtils.get_retry_stats().get("retries_server_error") == 1
+
+
+def test_upload_of_unknown_size(drive):
+    size = 3 * CHUNK_SIZE + 17
+    stream = SyntheticStream(size)
+
+    file = GoogleDriveUtils.upload_file_stream(
+        "synthetic.bin", "root", "application/octet-stream", stream, None, None, chunk_size=CHUNK_SIZE
+    )
+
+    assert file["id"] == "uploaded"
+    assert drive.received == size
+    assert drive.md5.hexdigest() == stream.md5.hexdigest()
@@ -0,0 +1,89 @@
+import json
+from typing import Any, Generator
+from dify_plugin.entities.tool import ToolInvokeMessage
+from dify_plugin import Tool
+from drive_utils import GoogleDriveUtils
+
+
+def parse_list(value: Any) -> list[str]:
+    """
+    Parse a list parameter given as a JSON array or a comma/newline separated string
+    """
+    if not value:
+        return []
+    if isinstance(value, list):
+        return [str(item).strip() for item in value if str(item).strip()]
+    value = str(value).strip()
+    if value.startswith("["):
+        return [str(item).strip() for item in json.loads(value) if str(item).strip()]
+    return [item.strip() for item in value.replace("\n", ",").split(",") if item.strip()]
+
+
+class GoogleDriveBatchOperation(Tool):
+
+    def _invoke(
+        self, tool_parameters: dict[str, Any]
+    ) -> Generator[ToolInvokeMessage, None, None]:
+        """
+        Run one operation on many Google Drive items using batched requests
+        """
+        operation = tool_parameters.get("operation", "")
+        target_folder_id = tool_parameters.get("target_folder_id", "")
+        email = tool_parameters.get("email", "")
+        role = tool_parameters.get("role", "reader") or "reader"
+
+        try:
+            file_ids = parse_list(tool_parameters.get("file_ids"))
+            names = parse_list(tool_parameters.get("names"))
+        except ValueError:
+            yield self.create_text_message("Invalid parameter: file_ids and names must be JSON arrays or comma separated lists")
+            return
+
+        if operation == "create_folders":
+            if not names:
+                yield self.create_text_message("Invalid parameter: names are required to create folders")
+                return
+        elif not file_ids:
+            yield self.create_text_message("Invalid parameter: file_ids are required")
+            return
+
+        try:
+            # Get credentials from the utility class
+            credentials_json = self.runtime.credentials["credentials_json"]
+            creds = GoogleDriveUtils.get_credentials(credentials_json)
+
+            if operation == "get_metadata":
+                results = GoogleDriveUtils.batch_get_metadata(file_ids, creds)
+            elif operation == "create_folders":
+                results = GoogleDriveUtils.batch_create_folders(names, target_folder_id or "root", creds)
+            elif operation == "rename":
+                results = GoogleDriveUtils.batch_rename(file_ids, names, creds)
+            elif operation == "move":
+                if not target_folder_id:
+                    yield self.create_text_message("Invalid parameter: target_folder_id is required to move files")
+                    return
+                results = GoogleDriveUtils.batch_move(file_ids, target_folder_id, creds)
+            elif operation == "trash":
+                results = GoogleDriveUtils.batch_trash(file_ids, creds)
+            elif operation == "share":
+                if not email:
+                    yield self.create_text_message("Invalid parameter: email is required to share files")
+                    return
+                results = GoogleDriveUtils.batch_share(file_ids, email, role, creds)
+            else:
+                yield self.create_text_message(f"Invalid parameter: unsupported operation '{operation}'")
+                return
+
+            succeeded = sum(1 for item in results if item.get("success"))
+            result = {
+                "operation": operation,
+                "total": len(results),
+                "succeeded": succeeded,
+                "failed": len(results) - succeeded,
+                "results": results
+            }
+
+            yield self.create_text_message(f"Batch {operation} completed: {succeeded} of {len(results)} succeeded")
+            yield self.create_json_message(result)
+        except Exception as e:
+            yield self.create_text_message(f"Error running batch operation: {str(e)}")
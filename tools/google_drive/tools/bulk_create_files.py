@@ -0,0 +1,76 @@
+from typing import Any, Generator
+from dify_plugin.entities.tool import ToolInvokeMessage
+from dify_plugin import Tool
+from drive_utils import GoogleDriveUtils, get_file_attributes
+
+
+class GoogleDriveBulkCreateFiles(Tool):
+
+    def _invoke(
+        self, tool_parameters: dict[str, Any]
+    ) -> Generator[ToolInvokeMessage, None, None]:
+        """
+        Upload several files to Google Drive in parallel
+        """
+        # Get parameters
+        files_data = tool_parameters.get("files") or []
+        parent_id = tool_parameters.get("parent_id", "root") or "root"
+        folder_name = tool_parameters.get("folder_name", "")
+        dedupe = bool(tool_parameters.get("dedupe", False))
+        
+        if not isinstance(files_data, list):
+            files_data = [files_data]
+        if not files_data:
+            yield self.create_text_message("Error: No file data provided")
+            return
+        
+        max_concurrency = tool_parameters.get("max_concurrency", GoogleDriveUtils.BULK_UPLOAD_WORKERS)
+        try:
+            max_concurrency = max(1, min(int(max_concurrency), GoogleDriveUtils.BULK_UPLOAD_MAX_WORKERS))
+        except (TypeError, ValueError):
+            max_concurrency = GoogleDriveUtils.BULK_UPLOAD_WORKERS
+        
+        # Collect name, MIME type and URL of every file
+        uploads = []
+        for index, file_data in enumerate(files_data):
+            file_name, mime_type, file_url = get_file_attributes(file_data)
+            if not file_url:
+                yield self.create_text_message(f"Error: No file URL provided for file {index + 1}")
+                return
+            uploads.append((file_name or f"file_{index + 1}", mime_type or "application/octet-stream", file_url))
+            
+        try:
+            # Get credentials from the utility class
+            credentials_json = self.runtime.credentials["credentials_json"]
+            creds = GoogleDriveUtils.get_credentials(credentials_json)
+            
+            # Resolve the target folder once for the whole batch
+            if folder_name:
+                print(f"Resolving folder path: {folder_name}")
+                try:
+                    parent_id = GoogleDriveUtils.resolve_folder_path(folder_name, creds, parent_id)
+                except ValueError as e:
+                    yield self.create_text_message(str(e))
+                    return
+            
+            results, stats = GoogleDriveUtils.bulk_upload_from_urls(
+                uploads, parent_id, creds, max_concurrency, dedupe
+            )
+            
+            result = {
+                "parent_id": parent_id,
+                "file_count": len(results),
+                **stats,
+                "files": results
+            }
+            
+            # Add folder information if folder was used
+            if folder_name:
+                result["folder_name"] = folder_name
+                
+            yield self.create_text_message(
+                f"Uploaded {stats['uploaded']} of {len(results)} files successfully"
+            )
+            yield self.create_json_message(result)
+        except Exception as e:
+            yield self.create_text_message(f"Error creating files: {str(e)}")
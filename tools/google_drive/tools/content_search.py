@@ -0,0 +1,49 @@
+from typing import Any, Generator
+from dify_plugin.entities.tool import ToolInvokeMessage
+from dify_plugin import Tool
+from drive_text import search_file_contents
+from drive_utils import GoogleDriveUtils
+
+
+class GoogleDriveContentSearch(Tool):
+
+    def _invoke(
+        self, tool_parameters: dict[str, Any]
+    ) -> Generator[ToolInvokeMessage, None, None]:
+        """
+        Search for files in Google Drive by content
+        """
+        query = tool_parameters.get("query", "")
+        parent_id = tool_parameters.get("parent_id", None)
+
+        if not query:
+            yield self.create_text_message("Invalid parameter: search query is required")
+            return
+            
+        max_results = tool_parameters.get("max_results", 10)
+        try:
+            max_results = int(max_results)
+        except ValueError:
+            max_results = 10
+            
+        try:
+            # Get credentials from the utility class
+            credentials_json = self.runtime.credentials["credentials_json"]
+            creds = GoogleDriveUtils.get_credentials(credentials_json)
+            
+            # Search file contents and attach cached snippets
+            files = search_file_contents(query, max_results, creds, parent_id)
+            
+            if not files:
+                yield self.create_text_message(f"No files found containing '{query}'")
+                return
+                
+            result = {
+                "file_count": len(files),
+                "files": files
+            }
+
+            yield self.create_text_message(f"Files found successfully: {len(files)} files")
+            yield self.create_json_message(result)
+        except Exception as e:
+            yield self.create_text_message(f"Error searching file contents: {str(e)}")
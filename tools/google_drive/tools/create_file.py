@@ -1,5 +1,4 @@
 from typing import Any, Generator
-import requests
 from dify_plugin.entities.tool import ToolInvokeMessage
 from dify_plugin import Tool
 from drive_utils import GoogleDriveUtils
@@ -18,6 +17,7 @@ class GoogleDriveCreateFile(Tool):
         file_name = tool_parameters.get("name", "")
         parent_id = tool_parameters.get("parent_id", "root")
         folder_name = tool_parameters.get("folder_name", "")
+        dedupe = bool(tool_parameters.get("dedupe", False))
         
         # Debug print
         print(f"File data type: {type(file_data)}")
@@ -67,24 +67,15 @@ class GoogleDriveCreateFile(Tool):
             credentials_json = self.runtime.credentials["credentials_json"]
             creds = GoogleDriveUtils.get_credentials(credentials_json)
             
-            # Handle folder_name if provided (prioritize over parent_id)
+            # Handle folder_name if provided (prioritize over parent_id).
+            # A slash-separated path like "reports/2026/q3" creates missing folders.
             if folder_name:
-                print(f"Checking for folder: {folder_name}")
-                folder_id = GoogleDriveUtils.find_folder_by_name(folder_name, creds, parent_id)
-                
-                if folder_id:
-                    print(f"Found existing folder: {folder_name} with ID: {folder_id}")
-                    parent_id = folder_id
-                else:
-                    print(f"Folder not found, creating new folder: {folder_name}")
-                    # Create the folder
-                    folder = GoogleDriveUtils.create_folder(folder_name, parent_id, creds)
-                    if folder:
-                        parent_id = folder.get("id")
-                        print(f"Created new folder with ID: {parent_id}")
-                    else:
-                        yield self.create_text_message(f"Error creating folder: {folder_name}")
-                        return
+                print(f"Resolving folder path: {folder_name}")
+                try:
+                    parent_id = GoogleDriveUtils.resolve_folder_path(folder_name, creds, parent_id)
+                except ValueError as e:
+                    yield self.create_text_message(str(e))
+                    return
         
             # Override with explicitly provided mime_type if available
             if tool_parameters.get("mime_type"):
@@ -100,27 +91,10 @@ class GoogleDriveCreateFile(Tool):
                 mime_type = "application/octet-stream"
                 print(f"No mime_type detected, using default: {mime_type}")
             
-            # Download file content from URL
-            try:
-                # Check if URL starts with /files and prepend appropriate URL
-                download_url = file_url
-                if file_url.startswith('/files'):
-                    # For Docker environment: use api service name instead of localhost
-                    # This assumes plugin is running in the same Docker network as Dify
-                    download_url = f"http://api:5001{file_url}"
-                    print(f"URL starts with /files, using Docker network URL: {download_url}")
-                
-                print(f"Downloading file from URL: {download_url}")
-                response = requests.get(download_url)
-                response.raise_for_status()  # Raise exception for non-200 status codes
-                file_content = response.content
-                print(f"Downloaded file content: {len(file_content)} bytes")
-            except Exception as e:
-                yield self.create_text_message(f"Error downloading file from URL: {str(e)}")
-                return
-            
-            # Create the file using the utility class
-            file = GoogleDriveUtils.create_file(file_name, parent_id, mime_type, file_content, creds)
+            # Stream file content from URL straight into a resumable upload
+            file = GoogleDriveUtils.upload_from_url(
+                file_name, parent_id, mime_type, file_url, creds, dedupe=dedupe
+            )
             
             result = {
                 "id": file.get("id"),
@@ -128,6 +102,7 @@ class GoogleDriveCreateFile(Tool):
                 "parent_id": parent_id,
                 "mime_type": mime_type,
                 "success": True,
+                "deduplicated": file.get("deduplicated", False),
                 "web_view_link": file.get("webViewLink", "")
             }
             
@@ -135,7 +110,10 @@ class GoogleDriveCreateFile(Tool):
             if folder_name:
                 result["folder_name"] = folder_name
                 
-            yield self.create_text_message("File created successfully")
+            if file.get("deduplicated"):
+                yield self.create_text_message("Identical file already exists, upload skipped")
+            else:
+                yield self.create_text_message("File created successfully")
             yield self.create_json_message(result)
         except Exception as e:
             yield self.create_text_message(f"Error creating file: {str(e)}")
@@ -1,7 +1,7 @@
 from typing import Any, Generator
 from dify_plugin.entities.tool import ToolInvokeMessage
 from dify_plugin import Tool
-from drive_utils import GoogleDriveUtils
+from drive_utils import GoogleDriveUtils, create_blob_chunk_messages
 
 
 class GoogleDriveFileDownload(Tool):
@@ -12,6 +12,7 @@ class GoogleDriveFileDownload(Tool):
         Download a file from Google Drive
         """
         file_id = tool_parameters.get("file_id", "")
+        export_format = tool_parameters.get("export_format") or "pdf"
 
         if not file_id:
             yield self.create_text_message("Invalid parameter: file_id is required")
@@ -22,26 +23,28 @@ class GoogleDriveFileDownload(Tool):
             credentials_json = self.runtime.credentials["credentials_json"]
             credentials = GoogleDriveUtils.get_credentials(credentials_json)
 
-            # Download the file using GoogleDriveUtils
-            file_content, metadata = GoogleDriveUtils.download_file(
-                file_id, credentials
+            # Download the file into a spooled temporary file using GoogleDriveUtils
+            file_obj, metadata = GoogleDriveUtils.download_file_spooled(
+                file_id, credentials, export_format=export_format
             )
 
-            if file_content is None:
+            if file_obj is None:
                 yield self.create_text_message(
                     f"Failed to download file with ID: {file_id}"
                 )
                 return
 
-            # Create blob message with the downloaded content
-            yield self.create_blob_message(file_content, metadata)
+            # Stream the downloaded content as blob chunks
+            file_size = metadata.pop("file_size")
+            with file_obj:
+                yield from create_blob_chunk_messages(file_obj, file_size, metadata)
 
             # Prepare result with enhanced metadata
             result = {
                 "file_id": file_id,
                 "file_name": metadata.get("file_name", "unknown"),
                 "mime_type": metadata.get("mime_type", "unknown"),
-                "file_size": len(file_content),
+                "file_size": file_size,
                 "exported": metadata.get("exported", False),
             }
 
@@ -51,12 +54,13 @@ class GoogleDriveFileDownload(Tool):
                 result["original_mime_type"] = metadata.get(
                     "original_mime_type", "unknown"
                 )
+                result["export_format"] = metadata.get("export_format")
 
             # Create success message with appropriate context
             if metadata.get("exported", False):
                 success_message = (
                     f"Google Workspace file '{metadata.get('original_name', 'unknown')}' "
-                    f"exported as PDF '{metadata.get('file_name', 'unknown')}' successfully"
+                    f"exported as {metadata.get('export_format', 'pdf').upper()} '{metadata.get('file_name', 'unknown')}' successfully"
                 )
             else:
                 success_message = f"File '{metadata.get('file_name', 'unknown')}' downloaded successfully"
@@ -0,0 +1,47 @@
+from typing import Any, Generator
+from dify_plugin.entities.tool import ToolInvokeMessage
+from dify_plugin import Tool
+from drive_text import read_file_range
+from drive_utils import GoogleDriveUtils, parse_int
+
+
+class GoogleDriveFileReadRange(Tool):
+    def _invoke(
+        self, tool_parameters: dict[str, Any]
+    ) -> Generator[ToolInvokeMessage, None, None]:
+        """
+        Read a byte range or the first lines of a Google Drive file
+        """
+        file_id = tool_parameters.get("file_id", "")
+
+        if not file_id:
+            yield self.create_text_message("Invalid parameter: file_id is required")
+            return
+
+        offset = parse_int(tool_parameters.get("offset"), 0)
+        length = parse_int(tool_parameters.get("length"), None, 1)
+        max_lines = parse_int(tool_parameters.get("max_lines"), None, 1)
+
+        try:
+            # Get credentials from the utility class
+            credentials_json = self.runtime.credentials["credentials_json"]
+            credentials = GoogleDriveUtils.get_credentials(credentials_json)
+
+            result = read_file_range(file_id, credentials, offset, length, max_lines)
+
+            if not result["length"]:
+                yield self.create_text_message(f"No content after byte {offset} of file '{result['file_name']}'")
+            elif "lines" in result:
+                yield self.create_text_message("\n".join(line["text"] for line in result["lines"]))
+            elif result["encoding"] == "utf-8":
+                yield self.create_text_message(result.pop("content"))
+            else:
+                yield self.create_text_message(
+                    f"Read {result['length']} bytes of binary content from file '{result['file_name']}' "
+                    f"starting at byte {result['offset']}, returned base64 encoded"
+                )
+            yield self.create_json_message(result)
+        except ValueError as e:
+            yield self.create_text_message(str(e))
+        except Exception as e:
+            yield self.create_text_message(f"Error reading file range: {str(e)}")
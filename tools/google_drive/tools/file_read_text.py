@@ -0,0 +1,57 @@
+from typing import Any, Generator
+from dify_plugin.entities.tool import ToolInvokeMessage
+from dify_plugin import Tool
+from drive_text import READ_MAX_CHARS, read_file_text
+from drive_utils import GoogleDriveUtils, parse_int
+
+# Default token budget of each chunk in chunks output mode
+DEFAULT_CHUNK_TOKENS = 512
+
+
+class GoogleDriveFileReadText(Tool):
+    def _invoke(
+        self, tool_parameters: dict[str, Any]
+    ) -> Generator[ToolInvokeMessage, None, None]:
+        """
+        Read the text of a Google Drive file
+        """
+        file_id = tool_parameters.get("file_id", "")
+
+        if not file_id:
+            yield self.create_text_message("Invalid parameter: file_id is required")
+            return
+
+        max_chars = parse_int(tool_parameters.get("max_chars"), READ_MAX_CHARS, 1)
+        start_page = parse_int(tool_parameters.get("start_page"), 1, 1)
+        max_pages = parse_int(tool_parameters.get("max_pages"), None, 1)
+        max_rows = parse_int(tool_parameters.get("max_rows"), None, 1)
+        byte_offset = parse_int(tool_parameters.get("byte_offset"), 0)
+        chunk_tokens = None
+        if tool_parameters.get("output_mode") == "chunks":
+            chunk_tokens = parse_int(tool_parameters.get("chunk_tokens"), DEFAULT_CHUNK_TOKENS, 16)
+
+        try:
+            # Get credentials from the utility class
+            credentials_json = self.runtime.credentials["credentials_json"]
+            credentials = GoogleDriveUtils.get_credentials(credentials_json)
+
+            result = read_file_text(
+                file_id, credentials, max_chars, start_page, max_pages, max_rows, byte_offset, chunk_tokens
+            )
+
+            if not result["char_count"]:
+                yield self.create_text_message(f"No text found in file '{result['file_name']}'")
+            elif chunk_tokens:
+                yield self.create_text_message(
+                    f"Read {result['chunk_count']} chunks of up to {chunk_tokens} tokens "
+                    f"from file '{result['file_name']}'"
+                )
+            else:
+                yield self.create_text_message(result.pop("text"))
+            result.pop("text", None)
+            yield self.create_json_message(result)
+
+        except ValueError as e:
+            yield self.create_text_message(str(e))
+        except Exception as e:
+            yield self.create_text_message(f"Error reading file: {str(e)}")
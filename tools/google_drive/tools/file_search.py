@@ -2,6 +2,7 @@ import json
 from typing import Any, Generator
 from dify_plugin.entities.tool import ToolInvokeMessage
 from dify_plugin import Tool
+from drive_mirror import DriveMetadataMirror
 from drive_utils import GoogleDriveUtils
 
 
@@ -26,32 +27,52 @@ class GoogleDriveFileSearch(Tool):
             max_results = int(max_results)
         except ValueError:
             max_results = 10
+        
+        use_mirror = tool_parameters.get("use_mirror", False)
+        max_staleness = tool_parameters.get("max_staleness", 60)
+        try:
+            max_staleness = float(max_staleness)
+        except (TypeError, ValueError):
+            max_staleness = 60
             
         try:
             # Get credentials from the utility class
             credentials_json = self.runtime.credentials["credentials_json"]
             creds = GoogleDriveUtils.get_credentials(credentials_json)
             
-            # Search files using the utility class
-            files = GoogleDriveUtils.search_files(query, max_results, creds, parent_id, file_type)
+            if use_mirror:
+                # Answer from the local metadata mirror, synced if older than max_staleness
+                mirror = DriveMetadataMirror.for_credentials(creds)
+                staleness = mirror.sync(max_staleness)
+                pages = [mirror.search(query, max_results, parent_id, file_type)]
+                freshness = {"source": "mirror", "staleness_seconds": round(staleness, 1)}
+            else:
+                # Stream search results page by page using the utility class
+                pages = GoogleDriveUtils.iter_search_files(query, max_results, creds, parent_id, file_type)
+                freshness = {}
+            
+            file_count = 0
+            for page in pages:
+                if not page:
+                    continue
+                file_count += len(page)
+                yield self.create_json_message({
+                    **freshness,
+                    "file_count": len(page),
+                    "files": [
+                        {
+                            "name": file["name"],
+                            "id": file["id"],
+                            "parent_id": file["parent_id"],
+                            "mime_type": file["mime_type"]
+                        } for file in page
+                    ]
+                })
             
-            if not files:
+            if not file_count:
                 yield self.create_text_message(f"No files found matching '{query}'")
                 return
-                
-            result = {
-                "file_count": len(files),
-                "files": [
-                    {
-                        "name": file["name"],
-                        "id": file["id"],
-                        "parent_id": file["parent_id"],
-                        "mime_type": file["mime_type"]
-                    } for file in files
-                ]
-            }
 
-            yield self.create_text_message("Files found successfully")
-            yield self.create_json_message(result)
+            yield self.create_text_message(f"Files found successfully: {file_count} files")
         except Exception as e:
             yield self.create_text_message(f"Error searching files: {str(e)}")
@@ -0,0 +1,46 @@
+import io
+from typing import Any, Generator
+from dify_plugin.entities.tool import ToolInvokeMessage
+from dify_plugin import Tool
+from drive_utils import GoogleDriveUtils, create_blob_chunk_messages
+
+
+class GoogleDriveFileThumbnail(Tool):
+    def _invoke(
+        self, tool_parameters: dict[str, Any]
+    ) -> Generator[ToolInvokeMessage, None, None]:
+        """
+        Fetch a thumbnail preview of a Google Drive file
+        """
+        file_id = tool_parameters.get("file_id", "")
+
+        if not file_id:
+            yield self.create_text_message("Invalid parameter: file_id is required")
+            return
+
+        size = tool_parameters.get("size", GoogleDriveUtils.THUMBNAIL_SIZE)
+        try:
+            size = int(size)
+        except (TypeError, ValueError):
+            size = GoogleDriveUtils.THUMBNAIL_SIZE
+
+        try:
+            # Get credentials from the utility class
+            credentials_json = self.runtime.credentials["credentials_json"]
+            credentials = GoogleDriveUtils.get_credentials(credentials_json)
+
+            content, metadata = GoogleDriveUtils.get_thumbnail(file_id, credentials, size)
+
+            yield from create_blob_chunk_messages(
+                io.BytesIO(content), len(content),
+                {"file_name": metadata["file_name"], "mime_type": metadata["mime_type"]}
+            )
+            yield self.create_text_message(
+                f"Thumbnail of '{metadata['original_name']}' fetched as '{metadata['file_name']}' "
+                f"({metadata['file_size']} bytes)"
+            )
+            yield self.create_json_message({"file_id": file_id, **metadata})
+        except ValueError as e:
+            yield self.create_text_message(str(e))
+        except Exception as e:
+            yield self.create_text_message(f"Error fetching thumbnail: {str(e)}")
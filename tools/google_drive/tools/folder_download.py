@@ -0,0 +1,56 @@
+from typing import Any, Generator
+from dify_plugin.entities.tool import ToolInvokeMessage
+from dify_plugin import Tool
+from drive_utils import GoogleDriveUtils, create_blob_chunk_messages
+
+
+class GoogleDriveFolderDownload(Tool):
+    def _invoke(
+        self, tool_parameters: dict[str, Any]
+    ) -> Generator[ToolInvokeMessage, None, None]:
+        """
+        Download a Google Drive folder as a ZIP archive
+        """
+        folder_id = tool_parameters.get("folder_id", "")
+
+        if not folder_id:
+            yield self.create_text_message("Invalid parameter: folder_id is required")
+            return
+
+        export_format = tool_parameters.get("export_format") or "pdf"
+        max_workers = tool_parameters.get("max_workers", GoogleDriveUtils.FOLDER_ARCHIVE_WORKERS)
+        try:
+            max_workers = max(1, min(int(max_workers), GoogleDriveUtils.FOLDER_ARCHIVE_MAX_WORKERS))
+        except (TypeError, ValueError):
+            max_workers = GoogleDriveUtils.FOLDER_ARCHIVE_WORKERS
+
+        try:
+            # Get credentials from the utility class
+            credentials_json = self.runtime.credentials["credentials_json"]
+            credentials = GoogleDriveUtils.get_credentials(credentials_json)
+
+            # Download the folder tree into a ZIP archive on disk
+            archive, summary = GoogleDriveUtils.download_folder_zip(
+                folder_id, credentials, max_workers, export_format
+            )
+
+            if not summary["file_count"]:
+                archive.close()
+                yield self.create_text_message(f"No files could be downloaded from folder with ID: {folder_id}")
+                yield self.create_json_message({"folder_id": folder_id, **summary})
+                return
+
+            # Stream the archive as blob chunks
+            file_name = f"{summary['folder_name']}.zip"
+            with archive:
+                yield from create_blob_chunk_messages(
+                    archive, summary["archive_size"], {"file_name": file_name, "mime_type": "application/zip"}
+                )
+
+            yield self.create_text_message(
+                f"Folder '{summary['folder_name']}' downloaded as '{file_name}' with {summary['file_count']} files"
+            )
+            yield self.create_json_message({"folder_id": folder_id, "file_name": file_name, **summary})
+
+        except Exception as e:
+            yield self.create_text_message(f"Error downloading folder: {str(e)}")
@@ -2,6 +2,7 @@ import json
 from typing import Any, Generator
 from dify_plugin.entities.tool import ToolInvokeMessage
 from dify_plugin import Tool
+from drive_mirror import DriveMetadataMirror
 from drive_utils import GoogleDriveUtils
 
 
@@ -25,6 +26,13 @@ class GoogleDriveFolderSearch(Tool):
             max_results = int(max_results)
         except ValueError:
             max_results = 10
+        
+        use_mirror = tool_parameters.get("use_mirror", False)
+        max_staleness = tool_parameters.get("max_staleness", 60)
+        try:
+            max_staleness = float(max_staleness)
+        except (TypeError, ValueError):
+            max_staleness = 60
             
         try:
             # Get credentials from the utility class
@@ -32,23 +40,38 @@ class GoogleDriveFolderSearch(Tool):
             creds = GoogleDriveUtils.get_credentials(credentials_json)
             
             # Use the folder type parameter to limit search to folders only
-            folders = GoogleDriveUtils.search_files(query, max_results, creds, parent_id, "folder")
+            if use_mirror:
+                # Answer from the local metadata mirror, synced if older than max_staleness
+                mirror = DriveMetadataMirror.for_credentials(creds)
+                staleness = mirror.sync(max_staleness)
+                pages = [mirror.search(query, max_results, parent_id, "folder")]
+                freshness = {"source": "mirror", "staleness_seconds": round(staleness, 1)}
+            else:
+                # Stream results page by page
+                pages = GoogleDriveUtils.iter_search_files(query, max_results, creds, parent_id, "folder")
+                freshness = {}
+            
+            folder_count = 0
+            for page in pages:
+                if not page:
+                    continue
+                folder_count += len(page)
+                yield self.create_json_message({
+                    **freshness,
+                    "folder_count": len(page),
+                    "folders": [
+                        {
+                            "name": folder["name"],
+                            "id": folder["id"],
+                            "parent_id": folder["parent_id"]
+                        } for folder in page
+                    ]
+                })
             
-            if not folders:
+            if not folder_count:
                 yield self.create_text_message(f"No folders found matching '{query}'")
                 return
                 
-            result = {
-                "folder_count": len(folders),
-                "folders": [
-                    {
-                        "name": folder["name"],
-                        "id": folder["id"],
-                        "parent_id": folder["parent_id"]
-                    } for folder in folders
-                ]
-            }
-            yield self.create_text_message("Folders found successfully")
-            yield self.create_json_message(result)
+            yield self.create_text_message(f"Folders found successfully: {folder_count} folders")
         except Exception as e:
             yield self.create_text_message(f"Error searching folders: {str(e)}")
@@ -0,0 +1,35 @@
+from typing import Any, Generator
+from dify_plugin.entities.tool import ToolInvokeMessage
+from dify_plugin import Tool
+from drive_utils import GoogleDriveUtils
+
+
+class GoogleDriveFolderStats(Tool):
+    def _invoke(
+        self, tool_parameters: dict[str, Any]
+    ) -> Generator[ToolInvokeMessage, None, None]:
+        """
+        Compute aggregate statistics of a Google Drive folder subtree
+        """
+        folder_id = tool_parameters.get("folder_id", "")
+
+        if not folder_id:
+            yield self.create_text_message("Invalid parameter: folder_id is required")
+            return
+
+        use_cache = tool_parameters.get("use_cache", True)
+
+        try:
+            # Get credentials from the utility class
+            credentials_json = self.runtime.credentials["credentials_json"]
+            credentials = GoogleDriveUtils.get_credentials(credentials_json)
+
+            stats = GoogleDriveUtils.get_folder_stats(folder_id, credentials, bool(use_cache))
+
+            yield self.create_text_message(
+                f"Folder contains {stats['file_count']} files in {stats['folder_count']} subfolders, "
+                f"{stats['total_bytes']} bytes in total"
+            )
+            yield self.create_json_message(stats)
+        except Exception as e:
+            yield self.create_text_message(f"Error computing folder statistics: {str(e)}")
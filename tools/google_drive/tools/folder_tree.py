@@ -0,0 +1,49 @@
+from typing import Any, Generator
+from dify_plugin.entities.tool import ToolInvokeMessage
+from dify_plugin import Tool
+from drive_utils import GoogleDriveUtils
+
+
+class GoogleDriveFolderTree(Tool):
+    def _invoke(
+        self, tool_parameters: dict[str, Any]
+    ) -> Generator[ToolInvokeMessage, None, None]:
+        """
+        List a Google Drive folder hierarchy as a nested tree
+        """
+        folder_id = tool_parameters.get("folder_id") or "root"
+
+        max_depth = tool_parameters.get("max_depth", 3)
+        try:
+            max_depth = int(max_depth)
+        except (TypeError, ValueError):
+            max_depth = 3
+        # 0 or less lists the whole hierarchy
+        max_depth = max_depth if max_depth > 0 else None
+
+        max_items = tool_parameters.get("max_items", 1000)
+        try:
+            max_items = max(1, int(max_items))
+        except (TypeError, ValueError):
+            max_items = 1000
+
+        folders_only = bool(tool_parameters.get("folders_only", False))
+
+        try:
+            # Get credentials from the utility class
+            credentials_json = self.runtime.credentials["credentials_json"]
+            credentials = GoogleDriveUtils.get_credentials(credentials_json)
+
+            result = GoogleDriveUtils.list_folder_tree(
+                folder_id, credentials, max_depth, max_items, folders_only
+            )
+
+            message = (f"Listed {result['folder_count']} folders and {result['file_count']} files "
+                       f"in {result['depth']} levels below '{result['tree']['name']}'")
+            if result["truncated"]:
+                message += (" (truncated, folders without children were not listed and folders "
+                            "marked truncated were listed partially)")
+            yield self.create_text_message(message)
+            yield self.create_json_message(result)
+        except Exception as e:
+            yield self.create_text_message(f"Error listing folder tree: {str(e)}")